@@ -15,7 +15,7 @@ router = APIRouter()
 def create_ab_test(
     test: schemas.ABTestCreate,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Create a new A/B test for comparing agent versions
@@ -63,7 +63,7 @@ def read_ab_tests(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve A/B tests with optional filtering
@@ -93,7 +93,7 @@ def read_ab_tests(
 def read_ab_test_by_id(
     test_id: int,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve a specific A/B test
@@ -113,7 +113,7 @@ def read_ab_test_by_id(
 def start_ab_test(
     test_id: int,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Start an A/B test
@@ -144,7 +144,7 @@ def start_ab_test(
 def stop_ab_test(
     test_id: int,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Stop an A/B test
@@ -175,7 +175,7 @@ def stop_ab_test(
 async def analyze_ab_test(
     test_id: int,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Analyze the results of a completed A/B test
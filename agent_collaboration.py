@@ -13,7 +13,7 @@ router = APIRouter()
 async def create_direct_message(
     message: schemas.DirectMessageCreate, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Create a direct message between agents
@@ -92,7 +92,7 @@ def read_direct_messages_by_session(
     skip: int = 0, 
     limit: int = 100, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve direct messages for a session
@@ -125,7 +125,7 @@ def read_direct_messages_by_agent(
     skip: int = 0, 
     limit: int = 100, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve direct messages for a specific agent
@@ -169,7 +169,7 @@ def read_direct_messages_by_agent(
 def create_agent_relationship(
     relationship: schemas.AgentRelationshipCreate, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Create a relationship between agents
@@ -212,7 +212,7 @@ def read_agent_relationships_by_session(
     skip: int = 0, 
     limit: int = 100, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve agent relationships for a session
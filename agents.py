@@ -9,7 +9,7 @@ from app.utils import auth
 router = APIRouter()
 
 @router.post("/", response_model=schemas.Agent)
-def create_agent(agent: schemas.AgentCreate, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+def create_agent(agent: schemas.AgentCreate, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(auth.get_current_user)):
     """
     Create a new agent
     """
@@ -27,7 +27,7 @@ def create_agent(agent: schemas.AgentCreate, db: Session = Depends(get_db), curr
     return db_agent
 
 @router.get("/", response_model=List[schemas.Agent])
-def read_agents(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+def read_agents(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(auth.get_current_user)):
     """
     Retrieve all agents owned by the current user
     """
@@ -35,7 +35,7 @@ def read_agents(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
     return agents
 
 @router.get("/{agent_id}", response_model=schemas.Agent)
-def read_agent(agent_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+def read_agent(agent_id: int, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(auth.get_current_user)):
     """
     Retrieve a specific agent by ID
     """
@@ -45,7 +45,7 @@ def read_agent(agent_id: int, db: Session = Depends(get_db), current_user: schem
     return agent
 
 @router.put("/{agent_id}", response_model=schemas.Agent)
-def update_agent(agent_id: int, agent: schemas.AgentCreate, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+def update_agent(agent_id: int, agent: schemas.AgentCreate, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(auth.get_current_user)):
     """
     Update an existing agent
     """
@@ -61,7 +61,7 @@ def update_agent(agent_id: int, agent: schemas.AgentCreate, db: Session = Depend
     return db_agent
 
 @router.delete("/{agent_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_agent(agent_id: int, db: Session = Depends(get_db), current_user: schemas.User = Depends(auth.get_current_user)):
+def delete_agent(agent_id: int, db: Session = Depends(get_db), current_user: schemas.CurrentUser = Depends(auth.get_current_user)):
     """
     Delete an agent
     """
@@ -1,14 +1,101 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from redis import RedisError
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
 
+from app.cache import redis_client
 from app.database import get_db
 from app.models import schemas, models
 from app.routes.auth import SECRET_KEY, ALGORITHM, oauth2_scheme
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+logger = logging.getLogger(__name__)
+
+# How long a resolved token subject stays cached before hitting the DB again
+USER_CACHE_TTL_SECONDS = 300
+
+# After a Redis error, lookups skip the cache this long instead of each waiting out the socket timeout
+USER_CACHE_RETRY_SECONDS = 30
+
+_user_cache_down_until = 0.0
+
+def _user_cache_key(username: str) -> str:
+    return f"sess:{username}"
+
+def _user_cache_available() -> bool:
+    return time.monotonic() >= _user_cache_down_until
+
+def _user_cache_failed(e: RedisError):
+    global _user_cache_down_until
+    _user_cache_down_until = time.monotonic() + USER_CACHE_RETRY_SECONDS
+    logger.warning(f"User cache unavailable: {e}")
+
+def _get_cached_user(username: str) -> Optional[schemas.CurrentUser]:
+    """
+    Return the user cached in Redis as (id, username, is_active), or None
+    """
+    if not _user_cache_available():
+        return None
+    try:
+        cached = redis_client.get(_user_cache_key(username))
+    except RedisError as e:
+        _user_cache_failed(e)
+        return None
+    
+    if cached is None:
+        return None
+    
+    return schemas.CurrentUser(**json.loads(cached))
+
+def _cache_user(user: schemas.CurrentUser):
+    if not _user_cache_available():
+        return
+    try:
+        redis_client.setex(_user_cache_key(user.username), USER_CACHE_TTL_SECONDS, user.json())
+    except RedisError as e:
+        _user_cache_failed(e)
+
+def invalidate_cached_user(username: str):
+    """
+    Drop the cached user, e.g. after a password change, deactivation or logout
+    """
+    try:
+        redis_client.delete(_user_cache_key(username))
+    except RedisError as e:
+        logger.warning(f"User cache unavailable: {e}")
+
+def _mark_user_stale(target: models.User):
+    object_session(target).info.setdefault("stale_cached_users", set()).add(target.username)
+
+@event.listens_for(models.User, "after_update")
+def _note_user_auth_change(mapper, connection, target):
+    """Remember users deactivated or given a new password; their cache entries go on commit."""
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ("is_active", "hashed_password")):
+        _mark_user_stale(target)
+
+@event.listens_for(models.User, "after_delete")
+def _note_user_deleted(mapper, connection, target):
+    _mark_user_stale(target)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    # After the commit, so a concurrent request can't re-cache the old row in between
+    for username in session.info.pop("stale_cached_users", ()):
+        invalidate_cached_user(username)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop("stale_cached_users", None)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> schemas.CurrentUser:
     """
-    Get current user from token
+    Get current user from token, as its id, username and is_active; load the User row for anything else
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -23,12 +110,18 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         token_data = schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
+    # Redis calls block, so they run in a thread rather than on the event loop
+    user = await asyncio.to_thread(_get_cached_user, token_data.username)
     if user is None:
-        raise credentials_exception
+        db_user = db.query(models.User).filter(models.User.username == token_data.username).first()
+        if db_user is None:
+            raise credentials_exception
+        user = schemas.CurrentUser(id=db_user.id, username=db_user.username, is_active=db_user.is_active)
+        await asyncio.to_thread(_cache_user, user)
+    
     return user
 
-async def get_current_active_user(current_user: schemas.User = Depends(get_current_user)):
+async def get_current_active_user(current_user: schemas.CurrentUser = Depends(get_current_user)):
     """
     Verify user is active
     """
@@ -14,7 +14,7 @@ router = APIRouter()
 async def create_conflict_resolution(
     conflict_resolution: schemas.ConflictResolutionCreate, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user),
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user),
     gemini_service: GeminiService = Depends(lambda: GeminiService())
 ):
     """
@@ -190,7 +190,7 @@ async def submit_vote(
     conflict_resolution_id: int,
     vote_data: Dict[str, Any],
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Submit a vote for a conflict resolution
@@ -306,7 +306,7 @@ async def submit_consensus_proposal(
     conflict_resolution_id: int,
     proposal_data: Dict[str, Any],
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user),
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user),
     gemini_service: GeminiService = Depends(lambda: GeminiService())
 ):
     """
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import models
+
+# pgvector, JSONB, TSVECTOR and the recursive-CTE graph need a real PostgreSQL server
+TEST_POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+# These modules import the PostgreSQL-only models, which would also land in the metadata the
+# SQLite-backed tests create; without a server they are left out of collection entirely
+POSTGRES_TEST_MODULES = [
+    "test_document_worker.py",
+    "test_knowledge_graph.py",
+    "test_performance.py",
+    "test_prompt_service.py",
+]
+if not TEST_POSTGRES_URL:
+    collect_ignore = POSTGRES_TEST_MODULES
+
+def pytest_report_header(config):
+    if not TEST_POSTGRES_URL:
+        return "PostgreSQL-backed tests not collected; set TEST_POSTGRES_URL to run them"
+
+@pytest.fixture(scope="session")
+def pg_engine():
+    engine = create_engine(TEST_POSTGRES_URL)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+    yield engine
+    engine.dispose()
+
+@pytest.fixture(scope="function")
+def pg_sessionmaker(pg_engine):
+    """A fresh schema for each test; use the factory directly when a test needs more than one session."""
+    Base.metadata.create_all(bind=pg_engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=pg_engine)
+    Base.metadata.drop_all(bind=pg_engine)
+
+@pytest.fixture(scope="function")
+def db(pg_sessionmaker):
+    db = pg_sessionmaker()
+    yield db
+    db.close()
+
+@pytest.fixture(scope="function")
+def user(db):
+    user = models.User(username="testuser", email="test@example.com", hashed_password="hashed_password")
+    db.add(user)
+    db.commit()
+    return user
@@ -2,6 +2,7 @@ from fastapi import WebSocket, WebSocketDisconnect
 from typing import Dict, List, Any
 import json
 import asyncio
+import orjson
 
 class ConnectionManager:
     """
@@ -38,20 +39,34 @@ class ConnectionManager:
                 if client_id in self.active_connections[session_id]:
                     await self.active_connections[session_id][client_id].send_json(message)
             else:
-                for connection in self.active_connections[session_id].values():
-                    await connection.send_json(message)
+                await self.broadcast(message, session_id)
+    
+    async def broadcast(self, message: Dict[str, Any], session_id: str):
+        """
+        Serialize a message once and send it to every client in a session concurrently
+        """
+        connections = list(self.active_connections.get(session_id, {}).items())
+        if not connections:
+            return
+        
+        payload = orjson.dumps(message).decode()
+        results = await asyncio.gather(
+            *(websocket.send_text(payload) for _, websocket in connections),
+            return_exceptions=True
+        )
+        # A failed send means the socket is gone; stop broadcasting to it
+        for (client_id, _), result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(session_id, client_id)
     
     async def broadcast_agent_message(self, message: Dict[str, Any], session_id: str):
         """
         Broadcast an agent message to all clients in a session
         """
-        if session_id in self.active_connections:
-            formatted_message = {
-                "type": "agent_message",
-                "data": message
-            }
-            for connection in self.active_connections[session_id].values():
-                await connection.send_json(formatted_message)
+        await self.broadcast({
+            "type": "agent_message",
+            "data": message
+        }, session_id)
 
 class WebSocketService:
     """
@@ -0,0 +1,79 @@
+"""
+Content-addressed cache of generated embeddings.
+Identical text (re-uploads, repeated queries, duplicate chunks) is embedded once per model;
+entries live in a process-local LRU backed by Redis so other workers and restarts share them.
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List
+
+import numpy as np
+from redis import RedisError
+
+from app.cache import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Two-tier (in-process LRU, Redis) cache of embeddings keyed by (model, sha256(text))."""
+
+    def __init__(self, model: str, max_entries: int = 10_000, ttl_seconds: int = 7 * 24 * 3600):
+        self.model = model
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def key(self, text: str) -> str:
+        return f"emb:{self.model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        """Return the cached embeddings among `keys`; missing keys are simply absent."""
+        found: Dict[str, List[float]] = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+                else:
+                    missing.append(key)
+
+        if missing:
+            try:
+                values = redis_client.mget(missing)
+            except RedisError as e:
+                logger.warning(f"Embedding cache unavailable: {e}")
+                values = [None] * len(missing)
+            remote = {
+                key: np.frombuffer(value, dtype=np.float32).tolist()
+                for key, value in zip(missing, values) if value is not None
+            }
+            self._remember(remote)
+            found.update(remote)
+
+        return found
+
+    def put_many(self, embeddings: Dict[str, List[float]]):
+        if not embeddings:
+            return
+        self._remember(embeddings)
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for key, embedding in embeddings.items():
+                pipe.setex(key, self.ttl_seconds, np.asarray(embedding, dtype=np.float32).tobytes())
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Embedding cache unavailable: {e}")
+
+    def _remember(self, embeddings: Dict[str, List[float]]):
+        with self._lock:
+            for key, embedding in embeddings.items():
+                self._entries[key] = embedding
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
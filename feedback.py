@@ -14,7 +14,7 @@ router = APIRouter()
 def create_feedback(
     feedback: schemas.AgentFeedbackCreate,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Create new feedback for an agent response
@@ -69,7 +69,7 @@ def read_feedback(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve feedback with optional filtering
@@ -105,7 +105,7 @@ def read_feedback(
 def read_feedback_by_id(
     feedback_id: int,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve a specific feedback item
@@ -127,7 +127,7 @@ def update_feedback(
     feedback_id: int,
     feedback_update: schemas.AgentFeedbackUpdate,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Update an existing feedback item
@@ -166,7 +166,7 @@ def update_feedback(
 def delete_feedback(
     feedback_id: int,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Delete a feedback item
@@ -189,7 +189,7 @@ def delete_feedback(
 def get_agent_feedback_summary(
     agent_id: int,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Get a summary of feedback for a specific agent
@@ -301,7 +301,7 @@ def get_agent_feedback_summary(
 def get_session_feedback_summary(
     session_id: int,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Get a summary of feedback for a specific session
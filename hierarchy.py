@@ -1,7 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy import insert, tuple_, update
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
+from datetime import datetime
 import json
+from collections import Counter
 
 from app.database import get_db
 from app.models import schemas, models
@@ -10,11 +14,48 @@ from app.services.ai.gemini_service import GeminiService, LangChainService
 
 router = APIRouter()
 
+# Built once at import so the list schema isn't recompiled per request
+_teams_adapter = TypeAdapter(List[schemas.Team])
+
+def load_team_for_write(db: Session, team_id: int, user_id: int) -> models.Team:
+    """
+    Load a team owned by the user and lock its row for the rest of the transaction
+    """
+    team = db.query(models.Team).filter(
+        models.Team.id == team_id,
+        models.Team.owner_id == user_id
+    ).with_for_update().first()
+    
+    if not team:
+        raise HTTPException(status_code=404, detail="Team not found")
+    
+    return team
+
+def bulk_insert_hierarchical_messages(db: Session, rows: List[Dict[str, Any]]) -> None:
+    """
+    Insert a batch of hierarchical messages (e.g. responses from several agents)
+    in a single executemany statement instead of one ORM add per message.
+    The caller is responsible for committing.
+    """
+    if not rows:
+        return
+    
+    db.execute(insert(models.HierarchicalMessage), rows)
+    
+    # Core inserts skip the ORM hooks that maintain TeamSession.message_count
+    counts = Counter(row["team_session_id"] for row in rows)
+    for team_session_id, count in counts.items():
+        db.execute(
+            update(models.TeamSession)
+            .where(models.TeamSession.id == team_session_id)
+            .values(message_count=models.TeamSession.message_count + count)
+        )
+
 @router.post("/roles/", response_model=schemas.AgentRole)
 def create_agent_role(
     role: schemas.AgentRoleCreate, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Create a new agent role
@@ -37,7 +78,7 @@ def read_agent_roles(
     skip: int = 0, 
     limit: int = 100, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve agent roles
@@ -49,7 +90,7 @@ def read_agent_roles(
 def read_agent_role(
     role_id: int, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve a specific agent role
@@ -64,7 +105,7 @@ def update_agent_role(
     role_id: int, 
     role_update: schemas.AgentRoleCreate, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Update an agent role
@@ -88,7 +129,7 @@ def update_agent_role(
 def delete_agent_role(
     role_id: int, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Delete an agent role
@@ -117,7 +158,7 @@ def delete_agent_role(
 def create_team(
     team: schemas.TeamCreate, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Create a new team
@@ -130,61 +171,83 @@ def create_team(
         is_public=team.is_public,
         hierarchy_structure=team.hierarchy_structure
     )
-    db.add(db_team)
-    db.commit()
-    db.refresh(db_team)
     
     # Add roles to the team if provided
     if team.role_ids:
-        for role_id in team.role_ids:
-            role = db.query(models.AgentRole).filter(models.AgentRole.id == role_id).first()
-            if role:
-                db_team.available_roles.append(role)
-        
-        db.commit()
-        db.refresh(db_team)
+        db_team.available_roles = db.query(models.AgentRole).filter(
+            models.AgentRole.id.in_(team.role_ids)
+        ).all()
     
     # Add agents to the team if provided
     if team.agent_ids:
-        for agent_id in team.agent_ids:
-            agent = db.query(models.Agent).filter(models.Agent.id == agent_id).first()
-            if agent:
-                db_team.members.append(agent)
-        
-        db.commit()
-        db.refresh(db_team)
+        db_team.members = db.query(models.Agent).filter(
+            models.Agent.id.in_(team.agent_ids)
+        ).all()
+    
+    # Insert the team and its associations in a single transaction
+    db.add(db_team)
+    db.commit()
+    db.refresh(db_team)
     
     return db_team
 
+def filter_visible_teams(query, is_public: Optional[bool], user_id: int):
+    """
+    Restrict a teams query to what the user may list
+    """
+    if is_public is None:
+        # Get user's teams and public teams
+        return query.filter(models.Team.visible_to(user_id))
+    elif is_public:
+        # Get only public teams
+        return query.filter(models.Team.is_public == True)
+    else:
+        # Get only user's private teams
+        return query.filter(
+            models.Team.owner_id == user_id,
+            models.Team.is_public == False
+        )
+
 @router.get("/teams/", response_model=List[schemas.Team])
 def read_teams(
     is_public: Optional[bool] = None,
     skip: int = 0, 
     limit: int = 100, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve teams
     """
     # Query teams
-    query = db.query(models.Team)
+    query = filter_visible_teams(db.query(models.Team), is_public, current_user.id)
     
-    if is_public is None:
-        # Get user's teams and public teams
-        query = query.filter(
-            (models.Team.owner_id == current_user.id) | 
-            (models.Team.is_public == True)
-        )
-    elif is_public:
-        # Get only public teams
-        query = query.filter(models.Team.is_public == True)
-    else:
-        # Get only user's private teams
-        query = query.filter(
-            models.Team.owner_id == current_user.id,
-            models.Team.is_public == False
-        )
+    # Apply pagination
+    teams = query.order_by(models.Team.created_at.desc()).offset(skip).limit(limit).all()
+    
+    # Serialize straight to JSON bytes in pydantic-core
+    validated = _teams_adapter.validate_python(teams, from_attributes=True)
+    return Response(content=_teams_adapter.dump_json(validated, by_alias=True), media_type="application/json")
+
+@router.get("/teams/summary", response_model=List[schemas.TeamListItem])
+def read_team_summaries(
+    is_public: Optional[bool] = None,
+    skip: int = 0, 
+    limit: int = 100, 
+    db: Session = Depends(get_db), 
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
+):
+    """
+    Retrieve a lightweight listing of teams, selecting only the listed columns
+    """
+    query = db.query(
+        models.Team.id,
+        models.Team.name,
+        models.Team.owner_id,
+        models.Team.is_public,
+        models.Team.created_at
+    )
+    query = filter_visible_teams(query, is_public, current_user.id)
     
     # Apply pagination
     teams = query.order_by(models.Team.created_at.desc()).offset(skip).limit(limit).all()
@@ -195,7 +258,7 @@ def read_teams(
 def read_team(
     team_id: int, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve a specific team
@@ -206,7 +269,7 @@ def read_team(
         raise HTTPException(status_code=404, detail="Team not found")
     
     # Check if user has access to this team
-    if team.owner_id != current_user.id and not team.is_public:
+    if not team.visible_to(current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized to access this team")
     
     return team
@@ -216,19 +279,12 @@ def update_team(
     team_id: int, 
     team_update: schemas.TeamUpdate, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Update a team
     """
-    db_team = db.query(models.Team).filter(models.Team.id == team_id).first()
-    
-    if not db_team:
-        raise HTTPException(status_code=404, detail="Team not found")
-    
-    # Check if user owns this team
-    if db_team.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this team")
+    db_team = load_team_for_write(db, team_id, current_user.id)
     
     # Update team fields
     if team_update.name is not None:
@@ -274,19 +330,12 @@ def update_team(
 def delete_team(
     team_id: int, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Delete a team
     """
-    db_team = db.query(models.Team).filter(models.Team.id == team_id).first()
-    
-    if not db_team:
-        raise HTTPException(status_code=404, detail="Team not found")
-    
-    # Check if user owns this team
-    if db_team.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this team")
+    db_team = load_team_for_write(db, team_id, current_user.id)
     
     # Delete role assignments for this team
     db.query(models.AgentRoleAssignment).filter(
@@ -319,18 +368,13 @@ def assign_role_to_agent(
     team_id: int,
     assignment: schemas.AgentRoleAssignmentCreate,
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Assign a role to an agent within a team
     """
-    # Check if team exists and user has access
-    team = db.query(models.Team).filter(models.Team.id == team_id).first()
-    if not team:
-        raise HTTPException(status_code=404, detail="Team not found")
-    
-    if team.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to manage this team")
+    # Check if team exists and user owns it
+    team = load_team_for_write(db, team_id, current_user.id)
     
     # Check if agent exists and is a member of the team
     agent = db.query(models.Agent).filter(models.Agent.id == assignment.agent_id).first()
@@ -376,18 +420,13 @@ def remove_role_from_agent(
     team_id: int,
     assignment_id: int,
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Remove a role assignment from an agent within a team
     """
-    # Check if team exists and user has access
-    team = db.query(models.Team).filter(models.Team.id == team_id).first()
-    if not team:
-        raise HTTPException(status_code=404, detail="Team not found")
-    
-    if team.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to manage this team")
+    # Check if team exists and user owns it
+    team = load_team_for_write(db, team_id, current_user.id)
     
     # Check if assignment exists and belongs to this team
     assignment = db.query(models.AgentRoleAssignment).filter(
@@ -410,7 +449,7 @@ def create_team_session(
     session_id: int,
     team_session: schemas.TeamSessionCreate,
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Create a new team session
@@ -420,7 +459,7 @@ def create_team_session(
     if not team:
         raise HTTPException(status_code=404, detail="Team not found")
     
-    if team.owner_id != current_user.id and not team.is_public:
+    if not team.visible_to(current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized to use this team")
     
     # Check if session exists and belongs to the user
@@ -455,24 +494,44 @@ def create_team_session(
 @router.get("/teams/{team_id}/sessions", response_model=List[schemas.TeamSession])
 def read_team_sessions(
     team_id: int,
+    before: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    skip: int = 0, 
+    limit: int = 100, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
-    Retrieve team sessions for a specific team
+    Retrieve team sessions for a specific team, newest first.
+    Pass the created_at and id of the last session received as `before` and
+    `before_id` to page through large teams without an ever-growing offset;
+    the id breaks ties between sessions created at the same instant.
     """
     # Check if team exists and user has access
     team = db.query(models.Team).filter(models.Team.id == team_id).first()
     if not team:
         raise HTTPException(status_code=404, detail="Team not found")
     
-    if team.owner_id != current_user.id and not team.is_public:
+    if not team.visible_to(current_user.id):
         raise HTTPException(status_code=403, detail="Not authorized to access this team")
     
     # Get team sessions
-    team_sessions = db.query(models.TeamSession).filter(
+    query = db.query(models.TeamSession).filter(
         models.TeamSession.team_id == team_id
-    ).all()
+    )
+    
+    if before is not None and before_id is not None:
+        query = query.filter(
+            tuple_(models.TeamSession.created_at, models.TeamSession.id) < tuple_(before, before_id)
+        )
+    elif before is not None:
+        query = query.filter(models.TeamSession.created_at < before)
+    
+    # Apply pagination
+    team_sessions = query.order_by(
+        models.TeamSession.created_at.desc(),
+        models.TeamSession.id.desc()
+    ).offset(skip).limit(limit).all()
     
     return team_sessions
 
@@ -481,7 +540,7 @@ async def create_hierarchical_message(
     team_session_id: int,
     message: schemas.HierarchicalMessageCreate,
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user),
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user),
     gemini_service: GeminiService = Depends(lambda: GeminiService())
 ):
     """
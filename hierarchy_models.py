@@ -1,11 +1,11 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Table, Text, JSON, DateTime, Enum, func
-from sqlalchemy.orm import relationship
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Table, Text, JSON, DateTime, Enum, Index, event, func, or_, update
+from sqlalchemy.ext.hybrid import hybrid_method
+from sqlalchemy.orm import relationship, backref
 from enum import Enum as PyEnum
 from typing import List, Optional, Dict, Any
 import datetime
 
-Base = declarative_base()
+from app.database import Base
 
 # Association table for team members
 team_member_association = Table(
@@ -29,17 +29,34 @@ class AgentRoleType(str, PyEnum):
     SPECIALIST = "specialist"
     OBSERVER = "observer"
 
+class HierarchicalMessageType(str, PyEnum):
+    INSTRUCTION = "instruction"
+    REPORT = "report"
+    QUESTION = "question"
+    RESPONSE = "response"
+    ACKNOWLEDGMENT = "acknowledgment"
+    ANSWER = "answer"
+    FEEDBACK = "feedback"
+
+def _enum_values(enum_class):
+    # Persist the lowercase values (e.g. "member") rather than the member names
+    return [member.value for member in enum_class]
+
 class AgentRole(Base):
     """
     Defines a role that can be assigned to agents within a team
     """
     __tablename__ = "agent_roles"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     permissions = Column(JSON, nullable=True)
-    role_type = Column(String, nullable=False, default=AgentRoleType.MEMBER)
+    role_type = Column(
+        Enum(AgentRoleType, name="agent_role_type", values_callable=_enum_values),
+        nullable=False,
+        default=AgentRoleType.MEMBER
+    )
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -53,10 +70,10 @@ class Team(Base):
     """
     __tablename__ = "teams"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     description = Column(Text, nullable=True)
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     is_public = Column(Boolean, default=False)
     hierarchy_structure = Column(JSON, nullable=True)  # Stores the team's hierarchical structure
     created_at = Column(DateTime, default=func.now())
@@ -69,16 +86,27 @@ class Team(Base):
     agent_role_assignments = relationship("AgentRoleAssignment", back_populates="team")
     team_sessions = relationship("TeamSession", back_populates="team")
 
+    @hybrid_method
+    def visible_to(self, user_id):
+        """
+        Whether the team is owned by the user or public
+        """
+        return self.owner_id == user_id or self.is_public
+
+    @visible_to.expression
+    def visible_to(cls, user_id):
+        return or_(cls.owner_id == user_id, cls.is_public == True)
+
 class AgentRoleAssignment(Base):
     """
     Assigns a role to an agent within a specific team
     """
     __tablename__ = "agent_role_assignments"
 
-    id = Column(Integer, primary_key=True, index=True)
-    team_id = Column(Integer, ForeignKey("teams.id"), nullable=False)
-    agent_id = Column(Integer, ForeignKey("agents.id"), nullable=False)
-    role_id = Column(Integer, ForeignKey("agent_roles.id"), nullable=False)
+    id = Column(Integer, primary_key=True)
+    team_id = Column(Integer, ForeignKey("teams.id"), nullable=False, index=True)
+    agent_id = Column(Integer, ForeignKey("agents.id"), nullable=False, index=True)
+    role_id = Column(Integer, ForeignKey("agent_roles.id"), nullable=False, index=True)
     assigned_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -94,11 +122,16 @@ class TeamSession(Base):
     Represents a session where a team of agents is working together
     """
     __tablename__ = "team_sessions"
+    __table_args__ = (
+        # Serves the newest-first keyset pagination in read_team_sessions
+        Index("ix_team_sessions_team_id_created_at_id", "team_id", "created_at", "id"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
-    team_id = Column(Integer, ForeignKey("teams.id"), nullable=False)
-    session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False)
+    id = Column(Integer, primary_key=True)
+    team_id = Column(Integer, ForeignKey("teams.id"), nullable=False)  # Covered by ix_team_sessions_team_id_created_at_id
+    session_id = Column(Integer, ForeignKey("sessions.id"), nullable=False, index=True)
     active_hierarchy = Column(JSON, nullable=True)  # The active hierarchy for this session
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")  # Maintained by HierarchicalMessage insert/delete hooks
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -113,11 +146,15 @@ class HierarchicalMessage(Base):
     """
     __tablename__ = "hierarchical_messages"
 
-    id = Column(Integer, primary_key=True, index=True)
-    team_session_id = Column(Integer, ForeignKey("team_sessions.id"), nullable=False)
-    sender_agent_id = Column(Integer, ForeignKey("session_agents.id"), nullable=False)
+    id = Column(Integer, primary_key=True)
+    team_session_id = Column(Integer, ForeignKey("team_sessions.id"), nullable=False, index=True)
+    sender_agent_id = Column(Integer, ForeignKey("session_agents.id"), nullable=False, index=True)
+    parent_message_id = Column(Integer, ForeignKey("hierarchical_messages.id"), nullable=True, index=True)  # Message this one responds to
     content = Column(Text, nullable=False)
-    message_type = Column(String, nullable=False)  # e.g., "instruction", "report", "question"
+    message_type = Column(
+        Enum(HierarchicalMessageType, name="hierarchical_message_type", values_callable=_enum_values),
+        nullable=False
+    )
     target_level = Column(String, nullable=True)  # Target hierarchy level (e.g., "all", "up", "down", "same")
     target_roles = Column(JSON, nullable=True)  # List of role IDs this message targets
     created_at = Column(DateTime, default=func.now())
@@ -125,7 +162,20 @@ class HierarchicalMessage(Base):
     # Relationships
     team_session = relationship("TeamSession", back_populates="hierarchical_messages")
     sender_agent = relationship("SessionAgent")
-    responses = relationship("HierarchicalMessage", 
-                            foreign_keys=[id],
-                            remote_side=[id],
-                            backref="parent_message")
+    responses = relationship("HierarchicalMessage",
+                            backref=backref("parent_message", remote_side=[id]))
+
+def _adjust_message_count(connection, team_session_id, delta):
+    connection.execute(
+        update(TeamSession.__table__)
+        .where(TeamSession.__table__.c.id == team_session_id)
+        .values(message_count=TeamSession.__table__.c.message_count + delta)
+    )
+
+@event.listens_for(HierarchicalMessage, "after_insert")
+def _increment_message_count(mapper, connection, target):
+    _adjust_message_count(connection, target.team_session_id, 1)
+
+@event.listens_for(HierarchicalMessage, "after_delete")
+def _decrement_message_count(mapper, connection, target):
+    _adjust_message_count(connection, target.team_session_id, -1)
@@ -1,9 +1,11 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from app.models.models import Base
-from app.database import get_db
+from app.database import SessionLocal
 from app.models.models import User
+from app.models import hierarchy_models  # Registers hierarchy tables on Base.metadata
+from app.models import knowledge_models  # Registers the pgvector-backed knowledge tables on Base.metadata
 from app.routes.auth import get_password_hash
 import logging
 
@@ -17,13 +19,17 @@ def init_db():
     """
     from app.database import engine
     
+    # Enable pgvector for knowledge item embeddings
+    with engine.begin() as connection:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+    
     # Create tables
     logger.info("Creating database tables...")
     Base.metadata.create_all(bind=engine)
     logger.info("Database tables created successfully")
     
     # Create admin user if it doesn't exist
-    db = next(get_db())
+    db = SessionLocal()
     admin_user = db.query(User).filter(User.username == "admin").first()
     
     if not admin_user:
@@ -2,11 +2,15 @@
 API routes for Knowledge Management System.
 """
 
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query
-from sqlalchemy.orm import Session
+import json
+from typing import List, Optional, Dict, Any, Set
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Response
+from pydantic import BaseModel
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.utils.auth import get_current_user
 from app.models.knowledge_models import (
     KnowledgeRepository,
@@ -21,7 +25,9 @@ from app.services.knowledge.knowledge_service import (
     KnowledgeService,
     DocumentService,
     WebResearchService,
-    CitationService
+    CitationService,
+    document_worker,
+    embedding_worker
 )
 from app.models.schemas import (
     KnowledgeRepositoryCreate,
@@ -36,21 +42,72 @@ from app.models.schemas import (
     CitationResponse,
     WebSearchResultResponse,
     KnowledgeGraphResponse,
-    UserResponse
+    CurrentUser
 )
 
+# Vector columns are internal to search; never serialize them into responses
+EMBEDDING_FIELDS = {"embedding"}
+
+class CitationPage(BaseModel):
+    """One page of citations; pass `next_cursor` back as `cursor` to fetch the next page."""
+    items: List[CitationResponse]
+    next_cursor: Optional[int] = None
+
+def paginate_citations(db: Session, column, value: int, cursor: Optional[int], limit: int) -> Dict[str, Any]:
+    """Keyset-paginate citations filtered on `column`, newest first."""
+    query = db.query(Citation).filter(column == value)
+    if cursor is not None:
+        query = query.filter(Citation.id < cursor)
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(Citation.id.desc()).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return {"items": rows[:limit], "next_cursor": next_cursor}
+
+def bulk_insert_web_results(db: Session, rows: List[Dict[str, Any]]) -> List[WebSearchResult]:
+    """Insert search results in one INSERT ... RETURNING round-trip instead of a flush per row."""
+    if not rows:
+        return []
+    # Bulk inserts skip mapper events, so fill the URL hash the before_insert hook would have set
+    rows = [
+        {**row, "url_sha256": row.get("url_sha256") or WebSearchResult.hash_url(row["url"])}
+        for row in rows
+    ]
+    results = db.scalars(insert(WebSearchResult).returning(WebSearchResult), rows).all()
+    db.commit()
+    return results
+
+async def get_accessible_repository_ids(
+    db: Session = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+) -> Set[int]:
+    """Repository ids the current user can read; FastAPI resolves this once per request."""
+    return await KnowledgeService.get_accessible_repository_ids(db, current_user.id)
+
 router = APIRouter(
     prefix="/knowledge",
     tags=["knowledge"],
     responses={404: {"description": "Not found"}},
 )
 
+@router.on_event("startup")
+async def start_background_workers():
+    # Start now rather than on the first upload, so work left by a previous process is backfilled
+    document_worker.start()
+    embedding_worker.start()
+
+@router.on_event("shutdown")
+async def stop_background_workers():
+    # Unclaimed work stays queued or pending in the database and is resumed by the next process;
+    # a document cut off mid-processing is reclaimed once its claim goes stale
+    await document_worker.stop()
+    await embedding_worker.stop()
+
 # Repository routes
 @router.post("/repositories", response_model=KnowledgeRepositoryResponse)
 async def create_repository(
     repository: KnowledgeRepositoryCreate,
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Create a new knowledge repository."""
     return await KnowledgeService.create_repository(
@@ -65,7 +122,7 @@ async def create_repository(
 async def get_repositories(
     include_public: bool = True,
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Get all repositories accessible by the current user."""
     return await KnowledgeService.get_repositories(
@@ -78,13 +135,14 @@ async def get_repositories(
 async def get_repository(
     repository_id: int,
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Get a specific repository if accessible by the current user."""
     repository = await KnowledgeService.get_repository(
         db=db,
         repository_id=repository_id,
-        user_id=current_user.id
+        user_id=current_user.id,
+        include_items=True
     )
     
     if not repository:
@@ -97,7 +155,7 @@ async def share_repository(
     repository_id: int,
     user_ids: List[int],
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Share a repository with other users."""
     return await KnowledgeService.share_repository(
@@ -108,11 +166,11 @@ async def share_repository(
     )
 
 # Knowledge item routes
-@router.post("/items", response_model=KnowledgeItemResponse)
+@router.post("/items", response_model=KnowledgeItemResponse, response_model_exclude=EMBEDDING_FIELDS)
 async def create_knowledge_item(
     item: KnowledgeItemCreate,
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Create a new knowledge item."""
     return await KnowledgeService.create_knowledge_item(
@@ -129,30 +187,43 @@ async def create_knowledge_item(
         tag_ids=item.tag_ids
     )
 
-@router.get("/search", response_model=List[KnowledgeItemResponse])
+@router.get("/search", response_model=List[KnowledgeItemResponse], response_model_exclude={"__all__": EMBEDDING_FIELDS})
 async def search_knowledge(
     query: str,
     repository_id: Optional[int] = None,
     tag_ids: List[int] = Query(None),
     limit: int = 10,
+    metadata: Optional[str] = Query(None, description="JSON object the item metadata must contain"),
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user),
+    accessible_repo_ids: Set[int] = Depends(get_accessible_repository_ids)
 ):
     """Search knowledge items using semantic search."""
+    metadata_filter = None
+    if metadata:
+        try:
+            metadata_filter = json.loads(metadata)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="metadata must be a JSON object")
+        if not isinstance(metadata_filter, dict):
+            raise HTTPException(status_code=400, detail="metadata must be a JSON object")
+    
     return await KnowledgeService.search_knowledge(
         db=db,
         user_id=current_user.id,
         query=query,
         repository_id=repository_id,
         tag_ids=tag_ids,
-        limit=limit
+        limit=limit,
+        metadata_filter=metadata_filter,
+        accessible_repo_ids=accessible_repo_ids
     )
 
 @router.post("/connections", response_model=KnowledgeConnectionResponse)
 async def create_connection(
     connection: KnowledgeConnectionCreate,
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Create a connection between two knowledge items."""
     return await KnowledgeService.create_connection(
@@ -169,23 +240,29 @@ async def get_knowledge_graph(
     central_item_id: Optional[int] = None,
     depth: int = 2,
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user),
+    accessible_repo_ids: Set[int] = Depends(get_accessible_repository_ids)
 ):
     """Get knowledge graph data for visualization."""
-    return await KnowledgeService.get_knowledge_graph(
+    graph = await KnowledgeService.get_knowledge_graph(
         db=db,
         user_id=current_user.id,
         repository_id=repository_id,
         central_item_id=central_item_id,
-        depth=depth
+        depth=depth,
+        accessible_repo_ids=accessible_repo_ids
     )
+    if isinstance(graph, str):
+        # Already serialized by the database; skip response-model validation
+        return Response(content=graph, media_type="application/json")
+    return graph
 
 # Document routes
 @router.post("/documents/upload", response_model=DocumentResponse)
 async def upload_document(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Upload a document and queue it for processing."""
     return await DocumentService.upload_document(
@@ -197,14 +274,20 @@ async def upload_document(
 @router.get("/documents/{document_id}", response_model=DocumentResponse)
 async def get_document(
     document_id: int,
-    db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Get a specific document."""
-    document = db.query(Document).filter(
-        Document.id == document_id,
-        Document.uploader_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Document).options(
+            selectinload(Document.knowledge_items),
+            joinedload(Document.uploader)
+        ).where(
+            Document.id == document_id,
+            Document.uploader_id == current_user.id
+        )
+    )
+    document = result.scalar_one_or_none()
     
     if not document:
         raise HTTPException(status_code=404, detail="Document not found or you don't have permission")
@@ -215,11 +298,14 @@ async def get_document(
 async def process_document(
     document_id: int,
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Process a document and extract knowledge items."""
+    """Queue a document for processing; the document worker extracts its knowledge items."""
     # Check if user has permission
-    document = db.query(Document).filter(
+    document = db.query(Document).options(
+        selectinload(Document.knowledge_items),
+        joinedload(Document.uploader)
+    ).filter(
         Document.id == document_id,
         Document.uploader_id == current_user.id
     ).first()
@@ -227,7 +313,11 @@ async def process_document(
     if not document:
         raise HTTPException(status_code=404, detail="Document not found or you don't have permission")
     
-    return await DocumentService.process_document(db=db, document_id=document_id)
+    # Processing goes through the worker's claim, so it never runs twice for the same document
+    document_worker.requeue(db, document_id)
+    document_worker.enqueue(document_id)
+    db.refresh(document)
+    return document
 
 # Web research routes
 @router.post("/web/search", response_model=List[WebSearchResultResponse])
@@ -236,7 +326,7 @@ async def search_web(
     search_engine: str = "google",
     num_results: int = 5,
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Perform a web search and store results."""
     return await WebResearchService.search_web(
@@ -247,14 +337,35 @@ async def search_web(
         num_results=num_results
     )
 
-@router.post("/web/results/{result_id}/add", response_model=KnowledgeItemResponse)
+@router.post("/web/results/{result_id}/add", response_model=KnowledgeItemResponse, response_model_exclude=EMBEDDING_FIELDS)
 async def add_web_result_to_knowledge(
     result_id: int,
     repository_id: int,
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Add a web search result to the knowledge base."""
+    # If the same page was already added to this repository, reuse that item and its embedding
+    web_result = db.query(WebSearchResult).filter(
+        WebSearchResult.id == result_id,
+        WebSearchResult.searcher_id == current_user.id
+    ).first()
+    repository = await KnowledgeService.get_repository(db=db, repository_id=repository_id, user_id=current_user.id)
+    if web_result and web_result.url_sha256 and repository:
+        existing_item = db.query(KnowledgeItem).join(
+            WebSearchResult, WebSearchResult.knowledge_item_id == KnowledgeItem.id
+        ).filter(
+            WebSearchResult.url_sha256 == web_result.url_sha256,
+            WebSearchResult.added_to_knowledge == True,
+            KnowledgeItem.repository_id == repository_id
+        ).first()
+        
+        if existing_item:
+            web_result.added_to_knowledge = True
+            web_result.knowledge_item_id = existing_item.id
+            db.commit()
+            return existing_item
+    
     return await WebResearchService.add_to_knowledge_base(
         db=db,
         web_result_id=result_id,
@@ -271,7 +382,7 @@ async def create_citation(
     context: str,
     relevance_score: float = 0.8,
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """Create a citation of a knowledge item by an agent."""
     return await CitationService.create_citation(
@@ -283,29 +394,35 @@ async def create_citation(
         relevance_score=relevance_score
     )
 
-@router.get("/citations/agent/{agent_id}", response_model=List[CitationResponse])
-async def get_citations_by_agent(
+@router.get("/citations/agent/{agent_id}", response_model=CitationPage)
+def get_citations_by_agent(
     agent_id: int,
+    cursor: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Get all citations by a specific agent."""
-    return await CitationService.get_citations_by_agent(db=db, agent_id=agent_id)
+    """Get citations by a specific agent, newest first, one page at a time."""
+    return paginate_citations(db, Citation.agent_id, agent_id, cursor, limit)
 
-@router.get("/citations/message/{message_id}", response_model=List[CitationResponse])
-async def get_citations_by_message(
+@router.get("/citations/message/{message_id}", response_model=CitationPage)
+def get_citations_by_message(
     message_id: int,
+    cursor: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Get all citations in a specific message."""
-    return await CitationService.get_citations_by_message(db=db, message_id=message_id)
+    """Get citations in a specific message, newest first, one page at a time."""
+    return paginate_citations(db, Citation.message_id, message_id, cursor, limit)
 
-@router.get("/citations/item/{knowledge_item_id}", response_model=List[CitationResponse])
-async def get_citations_by_knowledge_item(
+@router.get("/citations/item/{knowledge_item_id}", response_model=CitationPage)
+def get_citations_by_knowledge_item(
     knowledge_item_id: int,
+    cursor: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
     db: Session = Depends(get_db),
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    """Get all citations of a specific knowledge item."""
-    return await CitationService.get_citations_by_knowledge_item(db=db, knowledge_item_id=knowledge_item_id)
+    """Get citations of a specific knowledge item, newest first, one page at a time."""
+    return paginate_citations(db, Citation.knowledge_item_id, knowledge_item_id, cursor, limit)
@@ -2,20 +2,28 @@
 Knowledge Management System models for DeGeNz Lounge.
 """
 
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Table, Float
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Table, Float, Index, Computed, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import JSONB, ARRAY
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from pgvector.sqlalchemy import Vector
 
 from app.database import Base
 
 
+# Dimension of the vectors produced by the embedding model
+EMBEDDING_DIM = 768
+
+
 # Association table for knowledge items and tags
 knowledge_item_tags = Table(
     'knowledge_item_tags',
     Base.metadata,
-    Column('knowledge_item_id', Integer, ForeignKey('knowledge_items.id')),
-    Column('tag_id', Integer, ForeignKey('knowledge_tags.id'))
+    Column('knowledge_item_id', Integer, ForeignKey('knowledge_items.id'), index=True),
+    Column('tag_id', Integer, ForeignKey('knowledge_tags.id'), index=True)
 )
 
 # Association table for knowledge items and agents
@@ -62,6 +70,25 @@ class KnowledgeItem(Base):
     It can be a document, a web page, a note, or any other type of content.
     """
     __tablename__ = 'knowledge_items'
+    __table_args__ = (
+        # Approximate nearest-neighbour index for cosine-distance semantic search
+        Index(
+            'ix_knowledge_items_embedding_hnsw',
+            'embedding',
+            postgresql_using='hnsw',
+            postgresql_with={'m': 16, 'ef_construction': 64},
+            postgresql_ops={'embedding': 'vector_cosine_ops'}
+        ),
+        # Full-text keyword matching for hybrid search
+        Index('ix_knowledge_items_content_tsv', 'content_tsv', postgresql_using='gin'),
+        # Serves containment (@>) filters on metadata
+        Index(
+            'ix_knowledge_items_metadata_gin',
+            'metadata',
+            postgresql_using='gin',
+            postgresql_ops={'metadata': 'jsonb_path_ops'}
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False)
@@ -70,11 +97,15 @@ class KnowledgeItem(Base):
     source_url = Column(String(500))
     source_type = Column(String(50))  # user, agent, web, document, etc.
     importance = Column(Float, default=1.0)  # Used for ranking and retrieval
-    metadata = Column(JSONB)
-    embedding = Column(ARRAY(Float))  # Vector embedding for semantic search
+    meta = Column('metadata', JSONB)  # `metadata` is reserved on declarative classes
+    embedding = Column(Vector(EMBEDDING_DIM))  # Vector embedding for semantic search (pgvector)
+    embedding_status = Column(String(50), default="pending")  # pending, completed, failed
+    content_tsv = Column(TSVECTOR, Computed(
+        "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, ''))", persisted=True
+    ))  # Maintained by Postgres for keyword search
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    repository_id = Column(Integer, ForeignKey('knowledge_repositories.id'))
+    repository_id = Column(Integer, ForeignKey('knowledge_repositories.id'), index=True)
     creator_id = Column(Integer, ForeignKey('users.id'))
     
     # Relationships
@@ -109,8 +140,8 @@ class KnowledgeConnection(Base):
     __tablename__ = 'knowledge_connections'
 
     id = Column(Integer, primary_key=True, index=True)
-    source_id = Column(Integer, ForeignKey('knowledge_items.id'))
-    target_id = Column(Integer, ForeignKey('knowledge_items.id'))
+    source_id = Column(Integer, ForeignKey('knowledge_items.id'), index=True)
+    target_id = Column(Integer, ForeignKey('knowledge_items.id'), index=True)
     relationship_type = Column(String(50))  # e.g., "related", "contradicts", "supports", etc.
     strength = Column(Float, default=1.0)  # Connection strength (0.0 to 1.0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -131,11 +162,12 @@ class Document(Base):
     file_path = Column(String(500), nullable=False)
     file_type = Column(String(50))  # pdf, docx, txt, etc.
     file_size = Column(Integer)  # Size in bytes
+    content_sha256 = Column(String(64), index=True)  # Used to short-circuit re-uploads of identical files
     processed = Column(Boolean, default=False)
-    processing_status = Column(String(50), default="pending")  # pending, processing, completed, failed
+    processing_status = Column(String(50), default="pending")  # pending, queued, processing, completed, failed
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
-    uploader_id = Column(Integer, ForeignKey('users.id'))
+    uploader_id = Column(Integer, ForeignKey('users.id'), index=True)
     
     # Relationships
     uploader = relationship("User", back_populates="uploaded_documents")
@@ -156,6 +188,12 @@ class Citation(Base):
     Represents a citation of a knowledge item by an agent.
     """
     __tablename__ = 'citations'
+    __table_args__ = (
+        # Composite (filter, id) indexes serve keyset pagination as a single range scan
+        Index('ix_citations_knowledge_item_id_id', 'knowledge_item_id', 'id'),
+        Index('ix_citations_agent_id_id', 'agent_id', 'id'),
+        Index('ix_citations_message_id_id', 'message_id', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     knowledge_item_id = Column(Integer, ForeignKey('knowledge_items.id'))
@@ -178,7 +216,7 @@ class WebSearchResult(Base):
     __tablename__ = 'web_search_results'
 
     id = Column(Integer, primary_key=True, index=True)
-    query = Column(String(500), nullable=False)
+    query = Column(String(500), nullable=False, index=True)
     url = Column(String(500), nullable=False)
     title = Column(String(500))
     snippet = Column(Text)
@@ -188,11 +226,31 @@ class WebSearchResult(Base):
     added_to_knowledge = Column(Boolean, default=False)
     knowledge_item_id = Column(Integer, ForeignKey('knowledge_items.id'), nullable=True)
     searcher_id = Column(Integer, ForeignKey('users.id'))
+    url_sha256 = Column(String(64), index=True)  # SHA-256 of the normalized URL, for dedup
     
     # Relationships
     searcher = relationship("User", back_populates="web_searches")
     knowledge_item = relationship("KnowledgeItem")
 
+    @staticmethod
+    def hash_url(url: str) -> str:
+        """Hash a URL after normalizing scheme/host case and trailing slashes."""
+        parts = urlsplit(url.strip())
+        normalized = urlunsplit((
+            parts.scheme.lower(),
+            parts.netloc.lower(),
+            parts.path.rstrip('/') or '/',
+            parts.query,
+            ''
+        ))
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+@event.listens_for(WebSearchResult, 'before_insert')
+def _set_web_result_url_sha256(mapper, connection, target):
+    if target.url and not target.url_sha256:
+        target.url_sha256 = WebSearchResult.hash_url(target.url)
+
 
 # Add relationships to existing models
 
@@ -4,24 +4,35 @@ This module provides services for managing knowledge repositories, items, and re
 """
 
 import os
+import asyncio
+import hashlib
+import io
+import json
 import logging
 import tempfile
-from typing import List, Dict, Any, Optional
-from datetime import datetime
-from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Optional, Set, Union
+from datetime import datetime, timedelta
+from sqlalchemy import case, func, insert, literal, or_, select, text, update
+from sqlalchemy.orm import Session, selectinload
 from fastapi import UploadFile, HTTPException
+import aiofiles
 import numpy as np
 
+from app.database import SessionLocal
 from app.models.knowledge_models import (
     KnowledgeRepository, 
     KnowledgeItem, 
     KnowledgeTag, 
     KnowledgeConnection,
+    knowledge_item_tags,
     Document,
     Citation,
     WebSearchResult
 )
 from app.services.ai.unified_service import UnifiedAIService
+from app.services.knowledge.embedding_cache import EmbeddingCache
+from app.services.knowledge.semantic_cache import SemanticCache
+from app.services.knowledge.shared_search_cache import SharedSearchCache
 
 # Initialize logging
 logger = logging.getLogger(__name__)
@@ -29,9 +40,108 @@ logger = logging.getLogger(__name__)
 # Initialize AI service for embeddings and processing
 ai_service = UnifiedAIService()
 
+# Generated embeddings memoized by content hash; bump EMBEDDING_MODEL when the model changes
+embedding_cache = EmbeddingCache(os.getenv("EMBEDDING_MODEL", "default"))
+
+# Cache of recent search results, keyed by query text and query embedding
+search_cache = SemanticCache()
+
+# Exact-repeat search results shared with other workers through Redis
+shared_search_cache = SharedSearchCache()
+
+# HNSW candidate list size per query; larger trades latency for recall under filters
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "100"))
+# pgvector >= 0.8 can keep scanning the index until filtered results fill the limit
+# ("relaxed_order" or "strict_order"); empty leaves the server default
+HNSW_ITERATIVE_SCAN = os.getenv("HNSW_ITERATIVE_SCAN", "")
+
+# knowledge_items column -> bulk row key, in COPY order
+KNOWLEDGE_ITEM_COPY_COLUMNS = {
+    "title": "title",
+    "content": "content",
+    "content_type": "content_type",
+    "source_url": "source_url",
+    "source_type": "source_type",
+    "importance": "importance",
+    "metadata": "meta",
+    "embedding_status": "embedding_status",
+    "repository_id": "repository_id",
+    "creator_id": "creator_id",
+}
+
+def _copy_text_value(value) -> str:
+    """Encode a value as a field of COPY's text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+# Hybrid search score = keyword rank * HYBRID_TEXT_WEIGHT + cosine similarity * HYBRID_VECTOR_WEIGHT
+HYBRID_TEXT_WEIGHT = 0.4
+HYBRID_VECTOR_WEIGHT = 0.6
+
+# Walks connections in both directions from :root and assembles the graph JSON in Postgres.
+# {reached} is either the depth-bounded or the unbounded traversal below.
+GRAPH_JSON_SQL = """
+WITH RECURSIVE {reached},
+nodes AS (SELECT DISTINCT id FROM reached)
+SELECT jsonb_build_object(
+    'nodes', COALESCE((
+        SELECT jsonb_agg(jsonb_build_object(
+            'id', ki.id,
+            'label', ki.title,
+            'type', ki.content_type,
+            'importance', ki.importance,
+            'tags', COALESCE((
+                SELECT jsonb_agg(kt.name)
+                FROM knowledge_item_tags kit JOIN knowledge_tags kt ON kt.id = kit.tag_id
+                WHERE kit.knowledge_item_id = ki.id
+            ), '[]'::jsonb)
+        ))
+        FROM knowledge_items ki WHERE ki.id IN (SELECT id FROM nodes)
+    ), '[]'::jsonb),
+    'edges', COALESCE((
+        SELECT jsonb_agg(jsonb_build_object(
+            'source', kc.source_id,
+            'target', kc.target_id,
+            'type', kc.relationship_type,
+            'strength', kc.strength
+        ))
+        FROM knowledge_connections kc
+        WHERE kc.source_id IN (SELECT id FROM nodes) AND kc.target_id IN (SELECT id FROM nodes)
+    ), '[]'::jsonb)
+)::text
+"""
+
+GRAPH_REACHED_BOUNDED = """reached(id, d) AS (
+    SELECT CAST(:root AS INTEGER), 0
+    UNION
+    SELECT CASE WHEN kc.source_id = reached.id THEN kc.target_id ELSE kc.source_id END, reached.d + 1
+    FROM reached JOIN knowledge_connections kc ON kc.source_id = reached.id OR kc.target_id = reached.id
+    WHERE reached.d < :depth
+)"""
+
+# UNION on the id alone stops at already-reached nodes, so cycles terminate
+GRAPH_REACHED_UNBOUNDED = """reached(id) AS (
+    SELECT CAST(:root AS INTEGER)
+    UNION
+    SELECT CASE WHEN kc.source_id = reached.id THEN kc.target_id ELSE kc.source_id END
+    FROM reached JOIN knowledge_connections kc ON kc.source_id = reached.id OR kc.target_id = reached.id
+)"""
+
 class KnowledgeService:
     """Service for managing knowledge repositories and items."""
     
+    # Candidates per requested result taken from each of the vector and keyword indexes
+    RERANK_FACTOR = 4
+    
     @staticmethod
     async def create_repository(db: Session, name: str, description: str, owner_id: int, is_public: bool = False) -> KnowledgeRepository:
         """Create a new knowledge repository."""
@@ -49,33 +159,47 @@ class KnowledgeService:
     @staticmethod
     async def get_repositories(db: Session, user_id: int, include_public: bool = True) -> List[KnowledgeRepository]:
         """Get all repositories accessible by a user."""
-        query = db.query(KnowledgeRepository).filter(
-            (KnowledgeRepository.owner_id == user_id) | 
-            (KnowledgeRepository.shared_users.any(id=user_id))
+        return db.query(KnowledgeRepository).filter(
+            KnowledgeService._accessible_filter(user_id, include_public)
+        ).all()
+    
+    @staticmethod
+    async def get_accessible_repository_ids(db: Session, user_id: int, include_public: bool = True) -> Set[int]:
+        """Ids of the repositories accessible by a user, from one narrow SELECT."""
+        return set(db.scalars(
+            select(KnowledgeRepository.id).where(KnowledgeService._accessible_filter(user_id, include_public))
+        ).all())
+    
+    @staticmethod
+    def _accessible_filter(user_id: int, include_public: bool = True):
+        # One predicate so the planner does a single scan; any() is an EXISTS, so no duplicate rows
+        condition = or_(
+            KnowledgeRepository.owner_id == user_id,
+            KnowledgeRepository.shared_users.any(id=user_id)
         )
-        
         if include_public:
-            query = query.union(
-                db.query(KnowledgeRepository).filter(KnowledgeRepository.is_public == True)
-            )
-            
-        return query.all()
+            condition = or_(condition, KnowledgeRepository.is_public == True)
+        return condition
     
     @staticmethod
-    async def get_repository(db: Session, repository_id: int, user_id: int) -> Optional[KnowledgeRepository]:
-        """Get a specific repository if accessible by the user."""
-        repository = db.query(KnowledgeRepository).filter(KnowledgeRepository.id == repository_id).first()
-        
-        if not repository:
-            return None
-            
-        # Check if user has access
-        if (repository.owner_id == user_id or 
-            repository.is_public or 
-            any(user.id == user_id for user in repository.shared_users)):
-            return repository
-            
-        return None
+    async def get_repository(
+        db: Session,
+        repository_id: int,
+        user_id: int,
+        include_items: bool = False
+    ) -> Optional[KnowledgeRepository]:
+        """
+        Get a specific repository if accessible by the user.
+        `include_items` eager-loads its knowledge items, for callers that serialize them.
+        """
+        # Access is checked in SQL (shared_users as an EXISTS), so the M2M collection is never loaded
+        query = db.query(KnowledgeRepository).filter(
+            KnowledgeRepository.id == repository_id,
+            KnowledgeService._accessible_filter(user_id)
+        )
+        if include_items:
+            query = query.options(selectinload(KnowledgeRepository.knowledge_items))
+        return query.first()
     
     @staticmethod
     async def share_repository(db: Session, repository_id: int, owner_id: int, user_ids: List[int]) -> KnowledgeRepository:
@@ -121,9 +245,6 @@ class KnowledgeService:
         if not repository:
             raise HTTPException(status_code=404, detail="Repository not found or you don't have permission")
         
-        # Generate embedding for the content
-        embedding = await KnowledgeService._generate_embedding(content)
-        
         # Create knowledge item
         knowledge_item = KnowledgeItem(
             title=title,
@@ -132,8 +253,9 @@ class KnowledgeService:
             source_url=source_url,
             source_type=source_type,
             importance=importance,
-            metadata=metadata or {},
-            embedding=embedding,
+            meta=metadata or {},
+            embedding=None,  # Filled in by the background embedding worker
+            embedding_status="pending",
             repository_id=repository_id,
             creator_id=creator_id
         )
@@ -146,10 +268,86 @@ class KnowledgeService:
             tags = db.query(KnowledgeTag).filter(KnowledgeTag.id.in_(tag_ids)).all()
             knowledge_item.tags = tags
             db.commit()
+        
+        # Cached searches over this repository may now be missing the new item
+        KnowledgeService._invalidate_search_caches(repository_id)
             
         db.refresh(knowledge_item)
+        
+        # Embed in the background so the request doesn't wait on the model
+        embedding_worker.enqueue(knowledge_item.id)
         return knowledge_item
     
+    @staticmethod
+    async def create_knowledge_items_bulk(
+        db: Session,
+        repository_id: int,
+        creator_id: int,
+        items: List[Dict[str, Any]]
+    ) -> List[int]:
+        """
+        Create many items in one repository (e.g. the chunks of a document) in a single write.
+        Each dict takes the create_knowledge_item fields; ids are returned in input order.
+        The caller is responsible for the repository access check.
+        """
+        if not items:
+            return []
+        
+        rows = [
+            {
+                "title": item["title"],
+                "content": item.get("content"),
+                "content_type": item.get("content_type", "text"),
+                "source_url": item.get("source_url"),
+                "source_type": item.get("source_type", "user"),
+                "importance": item.get("importance", 1.0),
+                "meta": item.get("metadata") or {},
+                "embedding_status": "pending",
+                "repository_id": repository_id,
+                "creator_id": creator_id
+            }
+            for item in items
+        ]
+        
+        if db.bind.dialect.name == "postgresql":
+            item_ids = KnowledgeService._copy_knowledge_items(db, rows)
+        else:
+            item_ids = db.scalars(
+                insert(KnowledgeItem).returning(KnowledgeItem.id, sort_by_parameter_order=True),
+                rows
+            ).all()
+        db.commit()
+        
+        KnowledgeService._invalidate_search_caches(repository_id)
+        for item_id in item_ids:
+            embedding_worker.enqueue(item_id)
+        return list(item_ids)
+    
+    @staticmethod
+    def _copy_knowledge_items(db: Session, rows: List[Dict[str, Any]]) -> List[int]:
+        """Stream rows into knowledge_items with COPY, using ids reserved from the sequence up front."""
+        item_ids = db.execute(
+            text("SELECT nextval(pg_get_serial_sequence('knowledge_items', 'id')) FROM generate_series(1, :n)"),
+            {"n": len(rows)}
+        ).scalars().all()
+        
+        buffer = io.StringIO()
+        for item_id, row in zip(item_ids, rows):
+            values = [item_id] + [row[attr] for attr in KNOWLEDGE_ITEM_COPY_COLUMNS.values()]
+            buffer.write("\t".join(_copy_text_value(value) for value in values) + "\n")
+        buffer.seek(0)
+        
+        # Runs on the session's own connection, so it commits with the session
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY knowledge_items (id, {', '.join(KNOWLEDGE_ITEM_COPY_COLUMNS)}) FROM STDIN",
+                buffer
+            )
+        finally:
+            cursor.close()
+        return item_ids
+    
     @staticmethod
     async def search_knowledge(
         db: Session, 
@@ -157,19 +355,41 @@ class KnowledgeService:
         query: str, 
         repository_id: Optional[int] = None,
         tag_ids: Optional[List[int]] = None,
-        limit: int = 10
+        limit: int = 10,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        accessible_repo_ids: Optional[Set[int]] = None
     ) -> List[KnowledgeItem]:
-        """Search knowledge items using semantic search."""
-        # Generate embedding for the query
-        query_embedding = await KnowledgeService._generate_embedding(query)
-        
+        """
+        Search knowledge items using semantic search.
+        `metadata_filter` keeps items whose metadata contains the given keys and values.
+        `accessible_repo_ids` can be passed in when the caller already resolved them.
+        """
         # Get accessible repositories
-        accessible_repos = await KnowledgeService.get_repositories(db, user_id)
-        accessible_repo_ids = [repo.id for repo in accessible_repos]
+        if accessible_repo_ids is None:
+            accessible_repo_ids = await KnowledgeService.get_accessible_repository_ids(db, user_id)
         
         if repository_id and repository_id not in accessible_repo_ids:
             raise HTTPException(status_code=403, detail="You don't have access to this repository")
         
+        # Serve repeated queries from the cache before paying for an embedding
+        cache_scope = (
+            user_id, repository_id, tuple(sorted(tag_ids or [])), limit,
+            json.dumps(metadata_filter, sort_keys=True) if metadata_filter else None
+        )
+        cached_ids = search_cache.get(query, cache_scope)
+        if cached_ids is None:
+            cached_ids = shared_search_cache.get(query, cache_scope, repository_id)
+        if cached_ids is not None:
+            return KnowledgeService._load_items_in_order(db, cached_ids)
+        
+        # Generate embedding for the query
+        query_embedding = await KnowledgeService._generate_embedding(query)
+        
+        # Serve paraphrases of recent queries from the cache
+        cached_ids = search_cache.get_similar(query_embedding, cache_scope)
+        if cached_ids is not None:
+            return KnowledgeService._load_items_in_order(db, cached_ids)
+        
         # Filter by repository if specified
         repo_filter = KnowledgeItem.repository_id.in_(accessible_repo_ids)
         if repository_id:
@@ -183,55 +403,179 @@ class KnowledgeService:
             for tag_id in tag_ids:
                 knowledge_items = knowledge_items.filter(KnowledgeItem.tags.any(id=tag_id))
         
-        # Get all items that match the filters
-        items = knowledge_items.all()
+        if metadata_filter:
+            knowledge_items = knowledge_items.filter(KnowledgeItem.meta.contains(metadata_filter))
         
-        # Calculate similarity scores
-        scored_items = []
-        for item in items:
-            if item.embedding:
-                similarity = KnowledgeService._calculate_similarity(query_embedding, item.embedding)
-                scored_items.append((item, similarity))
+        if not query_embedding:
+            # Embedding failed; fall back to the most important matching items
+            return knowledge_items.order_by(KnowledgeItem.importance.desc()).limit(limit).all()
         
-        # Sort by similarity and return top results
-        scored_items.sort(key=lambda x: x[1], reverse=True)
-        return [item for item, score in scored_items[:limit]]
+        knowledge_items = knowledge_items.filter(KnowledgeItem.embedding.isnot(None))
+        
+        KnowledgeService._tune_hnsw_scan(db, limit)
+        items = KnowledgeService._hybrid_search(db, knowledge_items, query, query_embedding, limit)
+        
+        item_ids = [item.id for item in items]
+        search_cache.put(query, query_embedding, cache_scope, item_ids, repository_id=repository_id)
+        shared_search_cache.put(query, cache_scope, item_ids, repository_id)
+        return items
+    
+    @staticmethod
+    def _hybrid_search(db: Session, knowledge_items, query: str, query_embedding: List[float], limit: int) -> List[KnowledgeItem]:
+        """
+        Rank by a weighted sum of keyword rank and cosine similarity in one query.
+        Candidates are the nearest neighbours from the HNSW index plus the best full-text
+        matches from the GIN index, so exact keyword hits aren't lost to vector search.
+        """
+        pool_size = limit * KnowledgeService.RERANK_FACTOR
+        ts_query = func.plainto_tsquery('english', query)
+        distance = KnowledgeItem.embedding.cosine_distance(query_embedding)
+        # Normalization 32 maps the rank into [0, 1) so it is comparable with cosine similarity
+        text_rank = func.ts_rank_cd(KnowledgeItem.content_tsv, ts_query, 32)
+        
+        vector_candidates = knowledge_items.with_entities(KnowledgeItem.id).order_by(
+            distance
+        ).limit(pool_size).subquery()
+        text_candidates = knowledge_items.with_entities(KnowledgeItem.id).filter(
+            KnowledgeItem.content_tsv.op('@@')(ts_query)
+        ).order_by(text_rank.desc()).limit(pool_size).subquery()
+        
+        score = HYBRID_TEXT_WEIGHT * text_rank + HYBRID_VECTOR_WEIGHT * (1 - distance)
+        return db.query(KnowledgeItem).filter(or_(
+            KnowledgeItem.id.in_(select(vector_candidates.c.id)),
+            KnowledgeItem.id.in_(select(text_candidates.c.id))
+        )).order_by(score.desc()).limit(limit).all()
+    
+    @staticmethod
+    def _tune_hnsw_scan(db: Session, limit: int):
+        """
+        Widen the HNSW scan for this transaction only. Repository and tag filters are applied
+        after the index scan, so a narrow candidate list can come back with fewer than `limit` rows.
+        """
+        db.execute(text(f"SET LOCAL hnsw.ef_search = {min(max(HNSW_EF_SEARCH, limit), 1000)}"))
+        if HNSW_ITERATIVE_SCAN:
+            db.execute(text("SELECT set_config('hnsw.iterative_scan', :mode, true)"), {"mode": HNSW_ITERATIVE_SCAN})
+    
+    @staticmethod
+    def _invalidate_search_caches(repository_id: int):
+        """Drop cached searches that may be missing or mis-ranking items of the repository."""
+        search_cache.invalidate_repository(repository_id)
+        shared_search_cache.invalidate_repository(repository_id)
+    
+    @staticmethod
+    def _load_items_in_order(db: Session, item_ids: List[int]) -> List[KnowledgeItem]:
+        """Load knowledge items by id, preserving the order of the ids."""
+        if not item_ids:
+            return []
+        items_by_id = {
+            item.id: item
+            for item in db.query(KnowledgeItem).filter(KnowledgeItem.id.in_(item_ids)).all()
+        }
+        return [items_by_id[item_id] for item_id in item_ids if item_id in items_by_id]
     
     @staticmethod
     async def _generate_embedding(text: str) -> List[float]:
-        """Generate embedding vector for text using AI service."""
-        try:
-            # Use the default AI provider for embeddings
-            response = ai_service.generate_embedding(text)
-            return response.get("embedding", [])
-        except Exception as e:
-            logger.error(f"Error generating embedding: {e}")
-            # Return empty embedding if failed
+        """Generate a unit-length embedding vector for text using AI service."""
+        embeddings = await KnowledgeService._generate_embeddings_batch([text])
+        return embeddings[0]
+    
+    @staticmethod
+    async def _generate_embeddings_batch(texts: List[str]) -> List[List[float]]:
+        """Embed many texts, in input order, without blocking the event loop."""
+        return await asyncio.to_thread(KnowledgeService._embed_texts, texts)
+    
+    @staticmethod
+    def _embed_texts(texts: List[str]) -> List[List[float]]:
+        """
+        Embed many texts, in input order. Texts already embedded (by content hash) come from
+        the cache; the rest are deduplicated and sent to the provider together.
+        Entries are empty for texts that could not be embedded.
+        """
+        keys = [embedding_cache.key(text) for text in texts]
+        found = embedding_cache.get_many(set(keys))
+        
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            embeddings = KnowledgeService._request_embeddings(list(missing.values()))
+            # Unit vectors make cosine similarity a plain dot product everywhere downstream
+            fresh = {}
+            for key, embedding in zip(missing, embeddings):
+                embedding = KnowledgeService._normalize_embedding(embedding)
+                if embedding:
+                    fresh[key] = embedding
+            embedding_cache.put_many(fresh)
+            found.update(fresh)
+        
+        return [found.get(key, []) for key in keys]
+    
+    @staticmethod
+    def _request_embeddings(texts: List[str]) -> List[List[float]]:
+        """Call the AI provider, in one request when it supports batch input."""
+        generate_embeddings = getattr(ai_service, "generate_embeddings", None)
+        if generate_embeddings is not None:
+            try:
+                embeddings = generate_embeddings(texts).get("embeddings", [])
+                if len(embeddings) == len(texts):
+                    return embeddings
+                logger.error(f"Expected {len(texts)} embeddings from batch request, got {len(embeddings)}")
+            except Exception as e:
+                logger.error(f"Error generating embeddings: {e}")
+        
+        embeddings = []
+        for text in texts:
+            try:
+                # Use the default AI provider for embeddings
+                embeddings.append(ai_service.generate_embedding(text).get("embedding", []))
+            except Exception as e:
+                logger.error(f"Error generating embedding: {e}")
+                # Return empty embedding if failed
+                embeddings.append([])
+        return embeddings
+    
+    @staticmethod
+    def _normalize_embedding(embedding: List[float]) -> List[float]:
+        """Scale an embedding to unit length as float32; empty if it can't be normalized."""
+        if embedding is None or len(embedding) == 0:
+            return []
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm == 0:
             return []
+        return (vec / norm).tolist()
     
     @staticmethod
-    def _calculate_similarity(embedding1: List[float], embedding2: List[float]) -> float:
-        """Calculate cosine similarity between two embeddings."""
-        if not embedding1 or not embedding2:
-            return 0.0
-            
-        try:
-            # Convert to numpy arrays
-            vec1 = np.array(embedding1)
-            vec2 = np.array(embedding2)
+    def renormalize_embeddings(db: Session, batch_size: int = 500) -> int:
+        """
+        One-time migration: rescale embeddings stored before normalization moved into
+        _generate_embedding to unit length. Returns rows updated.
+        """
+        updated = 0
+        last_id = 0
+        while True:
+            items = db.query(KnowledgeItem).filter(
+                KnowledgeItem.id > last_id,
+                KnowledgeItem.embedding.isnot(None)
+            ).order_by(KnowledgeItem.id).limit(batch_size).all()
+            if not items:
+                break
             
-            # Calculate cosine similarity
-            dot_product = np.dot(vec1, vec2)
-            norm1 = np.linalg.norm(vec1)
-            norm2 = np.linalg.norm(vec2)
+            for item in items:
+                vec = np.asarray(item.embedding, dtype=np.float32)
+                if abs(float(np.vdot(vec, vec)) - 1.0) < 1e-4:
+                    continue
+                embedding = KnowledgeService._normalize_embedding(vec)
+                item.embedding = embedding or None
+                if not embedding:
+                    item.embedding_status = "failed"
+                updated += 1
             
-            if norm1 == 0 or norm2 == 0:
-                return 0.0
-                
-            return dot_product / (norm1 * norm2)
-        except Exception as e:
-            logger.error(f"Error calculating similarity: {e}")
-            return 0.0
+            last_id = items[-1].id
+            db.commit()
+        
+        # Cached results were computed from the old vectors
+        search_cache.clear()
+        shared_search_cache.clear()
+        return updated
     
     @staticmethod
     async def create_connection(
@@ -268,12 +612,16 @@ class KnowledgeService:
         user_id: int,
         repository_id: Optional[int] = None,
         central_item_id: Optional[int] = None,
-        depth: int = 2
-    ) -> Dict[str, Any]:
-        """Get knowledge graph data for visualization."""
+        depth: Optional[int] = 2,
+        accessible_repo_ids: Optional[Set[int]] = None
+    ) -> Union[Dict[str, Any], str]:
+        """
+        Get knowledge graph data for visualization.
+        On PostgreSQL a graph around a central item is returned as a ready-encoded JSON string.
+        """
         # Get accessible repositories
-        accessible_repos = await KnowledgeService.get_repositories(db, user_id)
-        accessible_repo_ids = [repo.id for repo in accessible_repos]
+        if accessible_repo_ids is None:
+            accessible_repo_ids = await KnowledgeService.get_accessible_repository_ids(db, user_id)
         
         if repository_id and repository_id not in accessible_repo_ids:
             raise HTTPException(status_code=403, detail="You don't have access to this repository")
@@ -283,49 +631,54 @@ class KnowledgeService:
         if repository_id:
             repo_filter = KnowledgeItem.repository_id == repository_id
         
-        # Get all items and connections
+        # Select the graph's items
         if central_item_id:
             # Start with the central item
-            central_item = db.query(KnowledgeItem).filter(
+            central_id = db.query(KnowledgeItem.id).filter(
                 KnowledgeItem.id == central_item_id,
                 repo_filter
-            ).first()
+            ).scalar()
             
-            if not central_item:
+            if central_id is None:
                 raise HTTPException(status_code=404, detail="Central knowledge item not found or not accessible")
             
+            if db.bind.dialect.name == "postgresql":
+                return KnowledgeService._get_graph_json(db, central_id, depth)
+            
             # Get connected items up to specified depth
-            items, connections = KnowledgeService._get_connected_items(db, central_item, depth)
+            node_filter = KnowledgeItem.id.in_(KnowledgeService._reachable_item_ids(db, central_id, depth))
         else:
             # Get all items in the repository/repositories
-            items = db.query(KnowledgeItem).filter(repo_filter).all()
-            
-            # Get all connections between these items
-            item_ids = [item.id for item in items]
-            connections = db.query(KnowledgeConnection).filter(
-                KnowledgeConnection.source_id.in_(item_ids),
-                KnowledgeConnection.target_id.in_(item_ids)
-            ).all()
+            node_filter = repo_filter
+        
+        # Project only the columns the visualization needs; no ORM objects are built
+        node_rows = db.query(
+            KnowledgeItem.id, KnowledgeItem.title, KnowledgeItem.content_type, KnowledgeItem.importance
+        ).filter(node_filter).all()
+        item_ids = [row.id for row in node_rows]
+        
+        tag_names = KnowledgeService._tag_names_by_item(db, item_ids)
+        
+        # Get all connections between these items
+        edge_rows = db.query(
+            KnowledgeConnection.source_id,
+            KnowledgeConnection.target_id,
+            KnowledgeConnection.relationship_type,
+            KnowledgeConnection.strength
+        ).filter(
+            KnowledgeConnection.source_id.in_(item_ids),
+            KnowledgeConnection.target_id.in_(item_ids)
+        ).all()
         
         # Format data for visualization
-        nodes = []
-        for item in items:
-            nodes.append({
-                "id": item.id,
-                "label": item.title,
-                "type": item.content_type,
-                "importance": item.importance,
-                "tags": [tag.name for tag in item.tags]
-            })
-        
-        edges = []
-        for conn in connections:
-            edges.append({
-                "source": conn.source_id,
-                "target": conn.target_id,
-                "type": conn.relationship_type,
-                "strength": conn.strength
-            })
+        nodes = [
+            {"id": item_id, "label": title, "type": content_type, "importance": importance, "tags": tag_names.get(item_id, [])}
+            for item_id, title, content_type, importance in node_rows
+        ]
+        edges = [
+            {"source": source_id, "target": target_id, "type": relationship_type, "strength": strength}
+            for source_id, target_id, relationship_type, strength in edge_rows
+        ]
         
         return {
             "nodes": nodes,
@@ -333,48 +686,285 @@ class KnowledgeService:
         }
     
     @staticmethod
-    def _get_connected_items(db: Session, central_item: KnowledgeItem, depth: int) -> tuple:
-        """Get items connected to the central item up to specified depth."""
-        items = set([central_item])
-        connections = set()
-        
-        # Process items level by level
-        current_level = {central_item.id}
-        for _ in range(depth):
-            next_level = set()
+    def _tag_names_by_item(db: Session, item_ids: List[int]) -> Dict[int, List[str]]:
+        """Tag names per item id from one query, without loading KnowledgeTag objects."""
+        tag_query = db.query(knowledge_item_tags.c.knowledge_item_id).join(
+            KnowledgeTag, KnowledgeTag.id == knowledge_item_tags.c.tag_id
+        ).filter(knowledge_item_tags.c.knowledge_item_id.in_(item_ids))
+        
+        if db.bind.dialect.name == "postgresql":
+            # Aggregate in the database: one row per item instead of one per tag
+            return dict(tag_query.add_columns(func.array_agg(KnowledgeTag.name)).group_by(
+                knowledge_item_tags.c.knowledge_item_id
+            ).all())
+        
+        tag_names: Dict[int, List[str]] = {}
+        for item_id, name in tag_query.add_columns(KnowledgeTag.name).all():
+            tag_names.setdefault(item_id, []).append(name)
+        return tag_names
+    
+    @staticmethod
+    def _get_graph_json(db: Session, central_item_id: int, depth: Optional[int]) -> str:
+        """Traverse and serialize the graph around an item in a single recursive CTE."""
+        params = {"root": central_item_id}
+        if depth is None:
+            sql = GRAPH_JSON_SQL.format(reached=GRAPH_REACHED_UNBOUNDED)
+        else:
+            sql = GRAPH_JSON_SQL.format(reached=GRAPH_REACHED_BOUNDED)
+            params["depth"] = depth
+        return db.execute(text(sql), params).scalar()
+    
+    @staticmethod
+    def _reachable_item_ids(db: Session, start_id: int, depth: Optional[int]) -> set:
+        """
+        Ids of items within `depth` connections of start_id, in either direction, via a recursive CTE.
+        depth=None walks the whole connected component.
+        """
+        if depth is None:
+            # UNION on the id alone stops at already-reached nodes, so cycles terminate
+            reached = select(literal(start_id).label("id")).cte("reached", recursive=True)
+        else:
+            reached = select(literal(start_id).label("id"), literal(0).label("d")).cte("reached", recursive=True)
+        
+        neighbour = case(
+            (KnowledgeConnection.source_id == reached.c.id, KnowledgeConnection.target_id),
+            else_=KnowledgeConnection.source_id
+        )
+        if depth is None:
+            step = select(neighbour)
+        else:
+            step = select(neighbour, reached.c.d + 1).where(reached.c.d < depth)
+        
+        reached = reached.union(step.select_from(reached.join(
+            KnowledgeConnection,
+            or_(KnowledgeConnection.source_id == reached.c.id, KnowledgeConnection.target_id == reached.c.id)
+        )))
+        return set(db.scalars(select(reached.c.id).distinct()).all())
+
+class EmbeddingWorker:
+    """
+    Background worker that embeds pending knowledge items in batches.
+    Items are queued by id; the worker drains up to BATCH_SIZE ids at a time,
+    loads them in one query and writes all their embeddings in one commit.
+    The database and provider work runs in a thread so the event loop keeps serving requests.
+    """
+    
+    BATCH_SIZE = 64
+    
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    def enqueue(self, item_id: int):
+        """Queue a knowledge item for embedding, starting the worker if needed. Safe to call from any thread."""
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if self._loop is not None and running_loop is not self._loop:
+            # Called from a worker thread (e.g. document processing); hand the id to the worker's loop
+            self._loop.call_soon_threadsafe(self.enqueue, item_id)
+            return
+        self.start()
+        self._queue.put_nowait(item_id)
+    
+    def start(self):
+        """Start the worker on the running event loop if it isn't already running."""
+        if self._task is not None and not self._task.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._task = self._loop.create_task(self._run())
+        # Pick up items left pending by a previous process
+        self._queue.put_nowait(None)
+    
+    async def stop(self):
+        """
+        Cancel the worker. Queued items stay "pending" in the database and are picked up
+        by the next process's backfill; a batch already running in its thread still commits.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+    
+    async def _run(self):
+        while True:
+            item_ids = [await self._queue.get()]
+            while len(item_ids) < self.BATCH_SIZE and not self._queue.empty():
+                item_ids.append(self._queue.get_nowait())
             
-            # Get all connections from current level
-            for item_id in current_level:
-                # Outgoing connections
-                outgoing = db.query(KnowledgeConnection).filter(
-                    KnowledgeConnection.source_id == item_id
-                ).all()
-                
-                for conn in outgoing:
-                    connections.add(conn)
-                    target = db.query(KnowledgeItem).filter(KnowledgeItem.id == conn.target_id).first()
-                    if target:
-                        items.add(target)
-                        next_level.add(target.id)
-                
-                # Incoming connections
-                incoming = db.query(KnowledgeConnection).filter(
-                    KnowledgeConnection.target_id == item_id
-                ).all()
-                
-                for conn in incoming:
-                    connections.add(conn)
-                    source = db.query(KnowledgeItem).filter(KnowledgeItem.id == conn.source_id).first()
-                    if source:
-                        items.add(source)
-                        next_level.add(source.id)
+            try:
+                more_pending = await asyncio.to_thread(self._process_batch, item_ids)
+                if more_pending:
+                    self._queue.put_nowait(None)
+            except Exception as e:
+                logger.error(f"Error embedding knowledge items {item_ids}: {e}")
+    
+    def _process_batch(self, item_ids: List[Optional[int]]) -> bool:
+        """Embed one batch; returns True when the backfill should fetch another batch."""
+        more_pending = False
+        db = SessionLocal()
+        try:
+            query = db.query(KnowledgeItem).filter(KnowledgeItem.embedding_status == "pending")
+            if None in item_ids:
+                # Backfill sentinel: embed the oldest pending items, one batch at a time
+                items = query.order_by(KnowledgeItem.id).limit(self.BATCH_SIZE).all()
+                more_pending = len(items) == self.BATCH_SIZE
+            else:
+                items = query.filter(KnowledgeItem.id.in_(item_ids)).all()
             
-            # Update current level for next iteration
-            current_level = next_level
-            if not current_level:
-                break
+            # One cache lookup and (at most) one provider request for the whole batch
+            embeddings = KnowledgeService._embed_texts([item.content or "" for item in items])
+            
+            repository_ids = set()
+            for item, embedding in zip(items, embeddings):
+                item.embedding = embedding or None
+                item.embedding_status = "completed" if embedding else "failed"
+                repository_ids.add(item.repository_id)
+            
+            db.commit()
+        finally:
+            db.close()
         
-        return list(items), list(connections)
+        # Newly embedded items can now show up in semantic search results
+        for repository_id in repository_ids:
+            KnowledgeService._invalidate_search_caches(repository_id)
+        return more_pending
+
+
+embedding_worker = EmbeddingWorker()
+
+
+class DocumentWorker:
+    """
+    Background worker that parses and embeds uploaded documents off the request path.
+    Documents are queued by id and processed one at a time, each in its own session on a thread.
+    A document is claimed by moving it from "queued" to "processing" first, so one that is
+    queued twice, or seen by several processes, is only processed once.
+    """
+    
+    # A claim older than this belongs to a process that died or was stopped mid-document
+    STALE_CLAIM_SECONDS = int(os.getenv("DOCUMENT_STALE_CLAIM_SECONDS", "1800"))
+    
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def enqueue(self, document_id: int):
+        """Queue a document for processing, starting the worker if needed."""
+        self.start()
+        self._queue.put_nowait(document_id)
+    
+    def start(self):
+        """Start the worker on the running event loop if it isn't already running."""
+        if self._task is not None and not self._task.done():
+            return
+        # Chunks are handed to the embedding worker from this worker's thread; it must live on this loop
+        embedding_worker.start()
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        # Pick up documents left queued, or stuck in processing, by a previous process
+        self._queue.put_nowait(None)
+    
+    async def stop(self):
+        """
+        Cancel the worker. Unclaimed documents stay "queued" for the next process; a document
+        already running in its thread finishes there, or is reclaimed once its claim goes stale.
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+    
+    async def _run(self):
+        while True:
+            document_id = await self._queue.get()
+            try:
+                if document_id is None:
+                    for queued_id in await asyncio.to_thread(self._queued_document_ids):
+                        self._queue.put_nowait(queued_id)
+                else:
+                    await asyncio.to_thread(self._process, document_id)
+            except Exception as e:
+                logger.error(f"Error processing document {document_id}: {e}")
+    
+    @staticmethod
+    def _queued_document_ids() -> List[int]:
+        """Requeue stale claims, then return every queued document id."""
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(Document).where(
+                    Document.processing_status == "processing",
+                    func.coalesce(Document.updated_at, Document.created_at)
+                    < func.now() - timedelta(seconds=DocumentWorker.STALE_CLAIM_SECONDS)
+                ).values(processing_status="queued")
+            )
+            db.commit()
+            return db.scalars(
+                select(Document.id).where(Document.processing_status == "queued").order_by(Document.id)
+            ).all()
+        finally:
+            db.close()
+    
+    @staticmethod
+    def requeue(db: Session, document_id: int):
+        """Queue a document for (re)processing unless it is already queued or being processed."""
+        db.execute(
+            update(Document).where(
+                Document.id == document_id,
+                Document.processing_status.notin_(("queued", "processing"))
+            ).values(processing_status="queued")
+        )
+        db.commit()
+    
+    @staticmethod
+    def _claim(db: Session, document_id: int) -> bool:
+        """Atomically move a document from "queued" to "processing"; False if someone else has it."""
+        claimed_id = db.execute(
+            update(Document).where(
+                Document.id == document_id,
+                Document.processing_status == "queued"
+            ).values(processing_status="processing").returning(Document.id)
+        ).scalar()
+        db.commit()
+        return claimed_id is not None
+    
+    @staticmethod
+    def _process(document_id: int):
+        # Runs on a worker thread with its own event loop for the async service code
+        db = SessionLocal()
+        try:
+            if not DocumentWorker._claim(db, document_id):
+                return
+            try:
+                asyncio.run(DocumentService.process_document(db, document_id))
+            except Exception:
+                db.rollback()
+                db.execute(
+                    update(Document).where(
+                        Document.id == document_id,
+                        Document.processing_status == "processing"
+                    ).values(processing_status="failed")
+                )
+                db.commit()
+                raise
+        finally:
+            db.close()
+
+
+document_worker = DocumentWorker()
 
 
 class DocumentService:
@@ -382,6 +972,7 @@ class DocumentService:
     
     ALLOWED_EXTENSIONS = {'pdf', 'docx', 'txt', 'md', 'csv', 'json'}
     UPLOAD_DIR = "uploads/documents"
+    UPLOAD_CHUNK_SIZE = 1024 * 1024
     
     @staticmethod
     async def upload_document(
@@ -403,11 +994,24 @@ class DocumentService:
         unique_filename = f"{timestamp}_{file.filename}"
         file_path = os.path.join(DocumentService.UPLOAD_DIR, unique_filename)
         
-        # Save file
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-            file_size = len(content)
+        # Stream the file to disk in fixed-size chunks, hashing and sizing it in the same pass
+        hasher = hashlib.sha256()
+        file_size = 0
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(DocumentService.UPLOAD_CHUNK_SIZE):
+                await buffer.write(chunk)
+                hasher.update(chunk)
+                file_size += len(chunk)
+        content_sha256 = hasher.hexdigest()
+        
+        # Re-uploads of an identical file reuse the existing (already processed) document
+        existing_document = db.query(Document).filter(
+            Document.uploader_id == uploader_id,
+            Document.content_sha256 == content_sha256
+        ).first()
+        if existing_document:
+            os.remove(file_path)
+            return existing_document
         
         # Create document record
         document = Document(
@@ -415,17 +1019,17 @@ class DocumentService:
             file_path=file_path,
             file_type=extension,
             file_size=file_size,
-            uploader_id=uploader_id
+            content_sha256=content_sha256,
+            uploader_id=uploader_id,
+            processing_status="queued"
         )
         
         db.add(document)
         db.commit()
         db.refresh(document)
         
-        # Queue document for processing
-        # In a production system, this would be handled by a background task
-        # For now, we'll process it synchronously
-        await DocumentService.process_document(db, document.id)
+        # Parsing and embedding run in the background; the upload returns as soon as the file is on disk
+        document_worker.enqueue(document.id)
         
         return document
     
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, JSON, Enum, Float
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, JSON, Enum, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -53,12 +53,20 @@ class PerformanceMetric(Base):
     session_id = Column(Integer, ForeignKey("sessions.id"), nullable=True)
     metric_name = Column(String)  # e.g., "response_time", "accuracy_score", "user_satisfaction"
     metric_value = Column(Float)
-    metadata = Column(JSON, nullable=True)  # Additional context about the metric
+    meta = Column('metadata', JSON, nullable=True)  # Additional context about the metric; `metadata` is reserved on declarative classes
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (
+        # Serves keyset pagination on (timestamp DESC, id DESC), scanned backwards
+        Index('ix_performance_metrics_agent_id_timestamp_id', 'agent_id', 'timestamp', 'id'),
+        # Per-name listings and trends of one agent, and everything keyed by session
+        Index('ix_performance_metrics_agent_id_metric_name_timestamp', 'agent_id', 'metric_name', 'timestamp'),
+        Index('ix_performance_metrics_session_id_timestamp', 'session_id', 'timestamp'),
+    )
+    
     # Relationships
-    agent = relationship("Agent")
-    session = relationship("Session", nullable=True)
+    agent = relationship("Agent", lazy="selectin")
+    session = relationship("Session")
 
 class ImprovementSuggestion(Base):
     """
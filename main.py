@@ -1,12 +1,20 @@
 import os
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
+import sys
+import logging
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import QUERY_COUNT_WARNING_THRESHOLD, get_db, start_query_count
 from app.routes import agents, sandbox, auth
+from app.services.websocket.connection import ConnectionManager
 
-app = FastAPI(title="DeGeNz Lounge API", description="API for DeGeNz Lounge - AI Agent Orchestration Platform")
+app = FastAPI(
+    title="DeGeNz Lounge API",
+    description="API for DeGeNz Lounge - AI Agent Orchestration Platform",
+    default_response_class=ORJSONResponse
+)
 
 # Configure CORS
 app.add_middleware(
@@ -17,38 +25,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+logger = logging.getLogger(__name__)
+
+@app.middleware("http")
+async def warn_on_query_heavy_requests(request: Request, call_next):
+    """Log requests that issue enough SQL statements to suggest an N+1 pattern."""
+    counter = start_query_count()
+    response = await call_next(request)
+    if counter[0] > QUERY_COUNT_WARNING_THRESHOLD:
+        logger.warning(f"{request.method} {request.url.path} issued {counter[0]} SQL statements")
+    return response
+
 # Include routers
 app.include_router(agents.router, prefix="/agents", tags=["agents"])
 app.include_router(sandbox.router, prefix="/sandbox", tags=["sandbox"])
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict = {}
-
-    async def connect(self, websocket: WebSocket, session_id: str, client_id: str):
-        await websocket.accept()
-        if session_id not in self.active_connections:
-            self.active_connections[session_id] = {}
-        self.active_connections[session_id][client_id] = websocket
-
-    def disconnect(self, session_id: str, client_id: str):
-        if session_id in self.active_connections:
-            if client_id in self.active_connections[session_id]:
-                del self.active_connections[session_id][client_id]
-            if not self.active_connections[session_id]:
-                del self.active_connections[session_id]
-
-    async def send_message(self, message: dict, session_id: str, client_id: str = None):
-        if session_id in self.active_connections:
-            if client_id:
-                if client_id in self.active_connections[session_id]:
-                    await self.active_connections[session_id][client_id].send_json(message)
-            else:
-                for connection in self.active_connections[session_id].values():
-                    await connection.send_json(message)
+@app.on_event("shutdown")
+async def drain_prompt_usage_analytics():
+    # Only drain if something loaded the prompt service; importing it here would pull its
+    # PostgreSQL-only models into an app that never uses them
+    prompt_service = sys.modules.get("app.services.prompt.prompt_service")
+    if prompt_service is not None:
+        await prompt_service.usage_analytics.drain()
 
+# WebSocket connection manager
 manager = ConnectionManager()
 
 @app.websocket("/ws/{session_id}/{client_id}")
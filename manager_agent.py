@@ -2,16 +2,27 @@ from langchain.agents import AgentExecutor, create_react_agent
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 from langchain.llms.base import BaseLLM
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+import copy
 import json
+import time
 
 class ManagerAgent:
     """
     Manager Agent for orchestrating tasks between different AI agents
     """
+    # Max (roster, user message) delegation decisions kept in memory
+    RESPONSE_CACHE_SIZE = 1024
+    # Seconds a delegation decision is reused; the roster key only covers id, name and role,
+    # so changes to anything else about an agent are picked up after this
+    RESPONSE_CACHE_TTL = 300
+    
     def __init__(self, llm):
         self.llm = llm
         self.agent_executor = self._create_agent_executor()
+        self._response_cache: "OrderedDict[Tuple, Tuple[float, Dict[str, Any]]]" = OrderedDict()
     
     def _create_agent_executor(self):
         """
@@ -53,13 +64,23 @@ class ManagerAgent:
         """
         Process a user message and delegate tasks to appropriate agents
         """
-        agents_str = "\n".join([f"ID: {agent['id']}, Name: {agent['name']}, Role: {agent['role']}" 
-                               for agent in available_agents])
-        
-        response = await self.agent_executor.arun(agents=agents_str, user_message=user_message)
+        roster = self._roster_key(available_agents)
+        cache_key = (roster, user_message)
+        cached = self._response_cache.get(cache_key)
+        if cached is not None:
+            expires_at, cached_result = cached
+            if expires_at > time.monotonic():
+                self._response_cache.move_to_end(cache_key)
+                return copy.deepcopy(cached_result)
+            del self._response_cache[cache_key]
+        
+        response = await self.agent_executor.arun(agents=self._render_agents(roster), user_message=user_message)
         
         try:
             result = json.loads(response)
+            self._response_cache[cache_key] = (time.monotonic() + self.RESPONSE_CACHE_TTL, copy.deepcopy(result))
+            if len(self._response_cache) > self.RESPONSE_CACHE_SIZE:
+                self._response_cache.popitem(last=False)
             return result
         except json.JSONDecodeError:
             # Fallback in case the response is not valid JSON
@@ -68,6 +89,24 @@ class ManagerAgent:
                 "assigned_agents": []
             }
     
+    @staticmethod
+    def _roster_key(available_agents: List[Dict[str, Any]]) -> Tuple:
+        """
+        Order-independent identity of the agents the manager can delegate to
+        """
+        return tuple(sorted(
+            (str(agent['id']), str(agent['name']), str(agent['role'])) for agent in available_agents
+        ))
+    
+    @staticmethod
+    @lru_cache(maxsize=RESPONSE_CACHE_SIZE)
+    def _render_agents(roster: Tuple) -> str:
+        """
+        Render the agents block once per roster; the same roster always yields the same
+        prompt prefix, which also lets provider-side prompt caching kick in
+        """
+        return "\n".join(f"ID: {agent_id}, Name: {name}, Role: {role}" for agent_id, name, role in roster)
+    
     async def resolve_conflicts(self, responses: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Resolve conflicts between agent responses
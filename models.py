@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, String, Text, ForeignKey, Boolean, DateTime, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import backref, relationship
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -58,7 +58,8 @@ class SessionAgent(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     session = relationship("Session", back_populates="agents")
-    agent = relationship("Agent", back_populates="sessions")
+    # Read whenever session agents are serialized; load them for the whole result set at once
+    agent = relationship("Agent", back_populates="sessions", lazy="selectin")
     messages = relationship("Message", back_populates="session_agent")
 
 class Message(Base):
@@ -73,5 +74,6 @@ class Message(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     session = relationship("Session", back_populates="messages")
-    session_agent = relationship("SessionAgent", back_populates="messages")
-    replies = relationship("Message", backref=ForeignKey("messages.parent_id"))
+    session_agent = relationship("SessionAgent", back_populates="messages", lazy="selectin")
+    # Self-referential thread: parent_id points at the message being replied to
+    replies = relationship("Message", backref=backref("parent", remote_side=[id]))
@@ -1,27 +1,128 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
+import base64
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import and_, case, func, lambda_stmt, or_, select
+from typing import List, Optional, Tuple
 from datetime import datetime, timedelta
 
-from app.database import get_db
+from app.database import get_async_db, get_db
 from app.models import models, schemas
 from app.models.learning_models import PerformanceMetric
 from app.utils import auth
 
 router = APIRouter()
 
+# Dashboards poll the summaries far more often than metrics change
+SUMMARY_CACHE_TTL_SECONDS = 30
+SUMMARY_CACHE_MAX_ENTRIES = 10_000
+_summary_cache: "OrderedDict[tuple, tuple]" = OrderedDict()  # (kind, user id, agent/session id, ..., etag) -> (expires_at, aggregates)
+_summary_cache_lock = threading.Lock()
+
+def _get_cached_summary(key: tuple) -> Optional[dict]:
+    with _summary_cache_lock:
+        entry = _summary_cache.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del _summary_cache[key]
+            return None
+        _summary_cache.move_to_end(key)
+        return entry[1]
+
+def _cache_summary(key: tuple, aggregates: dict):
+    with _summary_cache_lock:
+        _summary_cache[key] = (time.time() + SUMMARY_CACHE_TTL_SECONDS, aggregates)
+        _summary_cache.move_to_end(key)
+        while len(_summary_cache) > SUMMARY_CACHE_MAX_ENTRIES:
+            _summary_cache.popitem(last=False)
+
+TIME_PERIODS = {
+    "month": timedelta(days=30),
+    "week": timedelta(days=7),
+    "day": timedelta(days=1),
+}
+
+def _summary_cache_headers(etag: str) -> dict:
+    return {
+        "Cache-Control": f"private, max-age={SUMMARY_CACHE_TTL_SECONDS}",
+        "Vary": "Authorization",
+        "ETag": etag,
+    }
+
+def _summary_etag(*fingerprint) -> str:
+    """Weak ETag over whatever identifies the summary's content."""
+    return f'W/"{hashlib.sha1(repr(fingerprint).encode()).hexdigest()}"'
+
+def _is_not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    return bool(if_none_match) and etag in (tag.strip() for tag in if_none_match.split(","))
+
+async def _get_owned_metric(db: AsyncSession, metric_id: int, owner_id: int) -> Optional[PerformanceMetric]:
+    """
+    The metric, if it belongs to an agent owned by `owner_id`; the ownership check is part of the same query
+    """
+    return await db.scalar(
+        select(PerformanceMetric).join(
+            models.Agent, models.Agent.id == PerformanceMetric.agent_id
+        ).where(
+            PerformanceMetric.id == metric_id,
+            models.Agent.owner_id == owner_id
+        )
+    )
+
+class PerformanceMetricPage(BaseModel):
+    """One page of metrics; pass `next_cursor` back as `cursor` to fetch the next page."""
+    items: List[schemas.PerformanceMetric]
+    next_cursor: Optional[str] = None
+
+def _encode_metric_cursor(metric: PerformanceMetric) -> str:
+    return base64.urlsafe_b64encode(f"{metric.timestamp.isoformat()}|{metric.id}".encode()).decode()
+
+def _decode_metric_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        timestamp, metric_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(metric_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def _stats_by_metric_name(db: AsyncSession, filters: list) -> dict:
+    """
+    Count, sum, min, max and average of metric_value per metric name, aggregated in the database
+    """
+    result = await db.execute(
+        select(
+            PerformanceMetric.metric_name,
+            func.count(PerformanceMetric.id),
+            func.sum(PerformanceMetric.metric_value),
+            func.min(PerformanceMetric.metric_value),
+            func.max(PerformanceMetric.metric_value),
+            func.avg(PerformanceMetric.metric_value)
+        ).where(*filters).group_by(PerformanceMetric.metric_name)
+    )
+    rows = result.all()
+    
+    return {
+        name: {"count": count, "sum": total, "min": minimum, "max": maximum, "avg": average}
+        for name, count, total, minimum, maximum, average in rows
+    }
+
 @router.post("/metrics/", response_model=schemas.PerformanceMetric)
-def create_performance_metric(
+async def create_performance_metric(
     metric: schemas.PerformanceMetricCreate,
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Record a new performance metric for an agent
     """
     # Verify the agent exists and user has access
-    agent = db.query(models.Agent).filter(models.Agent.id == metric.agent_id).first()
+    agent = await db.get(models.Agent, metric.agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
@@ -30,7 +131,7 @@ def create_performance_metric(
     
     # If session_id is provided, verify it exists and user has access
     if metric.session_id:
-        session = db.query(models.Session).filter(models.Session.id == metric.session_id).first()
+        session = await db.get(models.Session, metric.session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
@@ -43,329 +144,335 @@ def create_performance_metric(
         session_id=metric.session_id,
         metric_name=metric.metric_name,
         metric_value=metric.metric_value,
-        metadata=metric.metadata
+        meta=metric.metadata
     )
     
     db.add(db_metric)
-    db.commit()
-    db.refresh(db_metric)
+    await db.commit()
+    await db.refresh(db_metric)
     
     return db_metric
 
-@router.get("/metrics/", response_model=List[schemas.PerformanceMetric])
-def read_performance_metrics(
+@router.get("/metrics/", response_model=PerformanceMetricPage)
+async def read_performance_metrics(
     agent_id: Optional[int] = None,
     session_id: Optional[int] = None,
     metric_name: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    skip: int = 0,
-    limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
-    Retrieve performance metrics with optional filtering
+    Retrieve performance metrics with optional filtering, newest first, one page at a time
     """
-    query = db.query(PerformanceMetric)
+    # A lambda statement is built and compiled once per combination of filters; later
+    # calls only re-bind the captured values
+    query = lambda_stmt(lambda: select(PerformanceMetric).options(selectinload(PerformanceMetric.agent)))
     
     # Apply filters
     if agent_id:
         # Verify user has access to this agent
-        agent = db.query(models.Agent).filter(models.Agent.id == agent_id).first()
+        agent = await db.get(models.Agent, agent_id)
         if not agent or agent.owner_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to access metrics for this agent")
         
-        query = query.filter(PerformanceMetric.agent_id == agent_id)
+        query += lambda q: q.where(PerformanceMetric.agent_id == agent_id)
     else:
         # If no agent specified, only return metrics for agents owned by the user
-        query = query.join(models.Agent).filter(models.Agent.owner_id == current_user.id)
+        owner_id = current_user.id
+        query += lambda q: q.join(models.Agent).where(models.Agent.owner_id == owner_id)
     
     if session_id:
         # Verify user has access to this session
-        session = db.query(models.Session).filter(models.Session.id == session_id).first()
+        session = await db.get(models.Session, session_id)
         if not session or session.owner_id != current_user.id:
             raise HTTPException(status_code=403, detail="Not authorized to access metrics for this session")
         
-        query = query.filter(PerformanceMetric.session_id == session_id)
+        query += lambda q: q.where(PerformanceMetric.session_id == session_id)
     
     if metric_name:
-        query = query.filter(PerformanceMetric.metric_name == metric_name)
+        query += lambda q: q.where(PerformanceMetric.metric_name == metric_name)
     
     if start_date:
-        query = query.filter(PerformanceMetric.timestamp >= start_date)
+        query += lambda q: q.where(PerformanceMetric.timestamp >= start_date)
     
     if end_date:
-        query = query.filter(PerformanceMetric.timestamp <= end_date)
-    
-    # Apply pagination and return results
-    metrics = query.order_by(PerformanceMetric.timestamp.desc()).offset(skip).limit(limit).all()
-    return metrics
+        query += lambda q: q.where(PerformanceMetric.timestamp <= end_date)
+    
+    # Keyset pagination: resume strictly after the last (timestamp, id) of the previous page
+    if cursor:
+        cursor_timestamp, cursor_id = _decode_metric_cursor(cursor)
+        query += lambda q: q.where(or_(
+            PerformanceMetric.timestamp < cursor_timestamp,
+            and_(PerformanceMetric.timestamp == cursor_timestamp, PerformanceMetric.id < cursor_id)
+        ))
+    
+    # Fetch one extra row to know whether another page exists
+    query += lambda q: q.order_by(PerformanceMetric.timestamp.desc(), PerformanceMetric.id.desc()).limit(limit + 1)
+    result = await db.scalars(query)
+    metrics = result.all()
+    next_cursor = _encode_metric_cursor(metrics[limit - 1]) if len(metrics) > limit else None
+    return {"items": metrics[:limit], "next_cursor": next_cursor}
 
 @router.get("/metrics/{metric_id}", response_model=schemas.PerformanceMetric)
-def read_performance_metric_by_id(
+async def read_performance_metric_by_id(
     metric_id: int,
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve a specific performance metric
     """
-    metric = db.query(PerformanceMetric).filter(PerformanceMetric.id == metric_id).first()
+    metric = await _get_owned_metric(db, metric_id, current_user.id)
     
     if not metric:
         raise HTTPException(status_code=404, detail="Performance metric not found")
     
-    # Verify user has access to the agent this metric belongs to
-    agent = db.query(models.Agent).filter(models.Agent.id == metric.agent_id).first()
-    if not agent or agent.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to access this metric")
-    
     return metric
 
 @router.delete("/metrics/{metric_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_performance_metric(
+async def delete_performance_metric(
     metric_id: int,
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Delete a performance metric
     """
-    db_metric = db.query(PerformanceMetric).filter(PerformanceMetric.id == metric_id).first()
+    db_metric = await _get_owned_metric(db, metric_id, current_user.id)
     
     if not db_metric:
         raise HTTPException(status_code=404, detail="Performance metric not found")
     
-    # Verify user has access to the agent this metric belongs to
-    agent = db.query(models.Agent).filter(models.Agent.id == db_metric.agent_id).first()
-    if not agent or agent.owner_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this metric")
-    
-    db.delete(db_metric)
-    db.commit()
+    await db.delete(db_metric)
+    await db.commit()
     
     return None
 
+async def _agent_summary_aggregates(db: AsyncSession, agent_id: int, time_period: Optional[str]) -> dict:
+    """
+    Statistics and daily trends for an agent's summary; everything except the recent metrics
+    """
+    # Apply time period filter against the database clock, so the statement is the same on every call
+    filters = [PerformanceMetric.agent_id == agent_id]
+    
+    period = TIME_PERIODS.get(time_period)
+    if period:
+        filters.append(PerformanceMetric.timestamp >= func.now() - period)
+    
+    # Per-name statistics for this agent in the specified time period
+    metrics_by_name = await _stats_by_metric_name(db, filters)
+    
+    if not metrics_by_name:
+        return {"total_metrics_count": 0, "metrics_by_name": {}, "trend_data": {}}
+    
+    # Daily averages per metric name, grouped in the database in one query
+    day = func.date(PerformanceMetric.timestamp).label("day")
+    result = await db.execute(
+        select(
+            PerformanceMetric.metric_name,
+            day,
+            func.avg(PerformanceMetric.metric_value)
+        ).where(
+            PerformanceMetric.agent_id == agent_id,
+            PerformanceMetric.metric_name.in_(metrics_by_name.keys())
+        ).group_by(PerformanceMetric.metric_name, day).order_by(day)
+    )
+    trend_rows = result.all()
+    
+    trend_data = {}
+    for name, trend_day, avg_value in trend_rows:
+        trend = trend_data.get(name)
+        if trend is None:
+            trend = trend_data[name] = {"dates": [], "values": []}
+        trend["dates"].append(str(trend_day))
+        trend["values"].append(avg_value)
+    
+    return {
+        "total_metrics_count": sum(stats["count"] for stats in metrics_by_name.values()),
+        "metrics_by_name": metrics_by_name,
+        "trend_data": trend_data
+    }
+
+async def _session_summary_aggregates(db: AsyncSession, session_id: int) -> dict:
+    """
+    Statistics for a session's summary, overall and per agent; everything except the recent metrics
+    """
+    # Per-name statistics for this session
+    metrics_by_name = await _stats_by_metric_name(db, [PerformanceMetric.session_id == session_id])
+    
+    if not metrics_by_name:
+        return {"total_metrics_count": 0, "metrics_by_name": {}, "metrics_by_agent": {}}
+    
+    # Per-agent, per-name statistics
+    result = await db.execute(
+        select(
+            PerformanceMetric.agent_id,
+            PerformanceMetric.metric_name,
+            func.count(PerformanceMetric.id),
+            func.sum(PerformanceMetric.metric_value)
+        ).where(
+            PerformanceMetric.session_id == session_id
+        ).group_by(PerformanceMetric.agent_id, PerformanceMetric.metric_name)
+    )
+    agent_rows = result.all()
+    
+    # Resolve all agent names in one query
+    agent_ids = {row[0] for row in agent_rows}
+    result = await db.execute(select(models.Agent.id, models.Agent.name).where(models.Agent.id.in_(agent_ids)))
+    agent_names = dict(result.all())
+    
+    # Group metrics by agent
+    metrics_by_agent = {}
+    for agent_id, metric_name, count, total in agent_rows:
+        agent_name = agent_names.get(agent_id, f"Agent {agent_id}")
+        
+        agent_stats = metrics_by_agent.get(agent_name)
+        if agent_stats is None:
+            agent_stats = metrics_by_agent[agent_name] = {"count": 0, "metrics": {}}
+        
+        agent_stats["count"] += count
+        
+        # Agents sharing a name are reported together, as before
+        metric_stats = agent_stats["metrics"].setdefault(metric_name, {"count": 0, "sum": 0})
+        metric_stats["count"] += count
+        metric_stats["sum"] += total
+        metric_stats["avg"] = metric_stats["sum"] / metric_stats["count"]
+    
+    return {
+        "total_metrics_count": sum(stats["count"] for stats in metrics_by_name.values()),
+        "metrics_by_name": metrics_by_name,
+        "metrics_by_agent": metrics_by_agent
+    }
+
 @router.get("/metrics/summary/agent/{agent_id}", response_model=schemas.AgentPerformanceSummary)
-def get_agent_performance_summary(
+async def get_agent_performance_summary(
     agent_id: int,
+    request: Request,
+    response: Response,
     time_period: Optional[str] = "all",  # all, month, week, day
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Get a summary of performance metrics for a specific agent
     """
     # Verify the agent exists and user has access
-    agent = db.query(models.Agent).filter(models.Agent.id == agent_id).first()
+    agent = await db.get(models.Agent, agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
     if agent.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to access metrics for this agent")
     
-    # Apply time period filter
-    query = db.query(PerformanceMetric).filter(PerformanceMetric.agent_id == agent_id)
-    
-    if time_period == "month":
-        query = query.filter(PerformanceMetric.timestamp >= datetime.now() - timedelta(days=30))
-    elif time_period == "week":
-        query = query.filter(PerformanceMetric.timestamp >= datetime.now() - timedelta(days=7))
-    elif time_period == "day":
-        query = query.filter(PerformanceMetric.timestamp >= datetime.now() - timedelta(days=1))
-    
-    # Get all metrics for this agent in the specified time period
-    metrics = query.all()
-    
-    if not metrics:
-        return {
-            "agent_id": agent_id,
-            "agent_name": agent.name,
-            "total_metrics_count": 0,
-            "time_period": time_period,
-            "metrics_by_name": {},
-            "recent_metrics": [],
-            "trend_data": {}
-        }
-    
-    # Group metrics by name and calculate statistics
-    metrics_by_name = {}
-    for metric in metrics:
-        if metric.metric_name not in metrics_by_name:
-            metrics_by_name[metric.metric_name] = {
-                "count": 0,
-                "sum": 0,
-                "min": float('inf'),
-                "max": float('-inf'),
-                "values": []
-            }
-        
-        metrics_by_name[metric.metric_name]["count"] += 1
-        metrics_by_name[metric.metric_name]["sum"] += metric.metric_value
-        metrics_by_name[metric.metric_name]["min"] = min(metrics_by_name[metric.metric_name]["min"], metric.metric_value)
-        metrics_by_name[metric.metric_name]["max"] = max(metrics_by_name[metric.metric_name]["max"], metric.metric_value)
-        metrics_by_name[metric.metric_name]["values"].append(metric.metric_value)
-    
-    # Calculate averages and clean up
-    for name, stats in metrics_by_name.items():
-        stats["avg"] = stats["sum"] / stats["count"]
-        # Remove the values list as it's not needed in the response
-        del stats["values"]
+    # The newest timestamp and row counts change whenever the summary would; an unchanged
+    # fingerprint answers 304 without aggregating or serializing anything
+    fingerprint = [func.max(PerformanceMetric.timestamp), func.count(PerformanceMetric.id)]
+    period = TIME_PERIODS.get(time_period)
+    if period:
+        fingerprint.append(func.count(case((PerformanceMetric.timestamp >= func.now() - period, 1))))
+    result = await db.execute(select(*fingerprint).where(PerformanceMetric.agent_id == agent_id))
+    etag = _summary_etag(agent.name, time_period, *result.one())
+    
+    headers = _summary_cache_headers(etag)
+    if _is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    
+    # Keyed by the ETag so a cached body always matches the ETag it is served under; a write from
+    # any worker changes the ETag, so nothing needs invalidating
+    cache_key = ("agent", current_user.id, agent_id, time_period, etag)
+    aggregates = _get_cached_summary(cache_key)
+    if aggregates is None:
+        aggregates = await _agent_summary_aggregates(db, agent_id, time_period)
+        _cache_summary(cache_key, aggregates)
     
     # Get recent metrics
-    recent_metrics = db.query(PerformanceMetric).filter(
-        PerformanceMetric.agent_id == agent_id
-    ).order_by(PerformanceMetric.timestamp.desc()).limit(10).all()
-    
-    # Generate trend data for each metric type
-    trend_data = {}
-    for name in metrics_by_name.keys():
-        # Get metrics for this name, ordered by timestamp
-        trend_metrics = db.query(PerformanceMetric).filter(
-            PerformanceMetric.agent_id == agent_id,
-            PerformanceMetric.metric_name == name
-        ).order_by(PerformanceMetric.timestamp.asc()).all()
-        
-        # Group by day for the trend
-        trend_by_day = {}
-        for metric in trend_metrics:
-            day = metric.timestamp.date().isoformat()
-            if day not in trend_by_day:
-                trend_by_day[day] = []
-            trend_by_day[day].append(metric.metric_value)
-        
-        # Calculate daily averages
-        trend_data[name] = {
-            "dates": [],
-            "values": []
-        }
-        
-        for day, values in trend_by_day.items():
-            trend_data[name]["dates"].append(day)
-            trend_data[name]["values"].append(sum(values) / len(values))
+    recent_metrics = []
+    if aggregates["total_metrics_count"]:
+        result = await db.scalars(
+            select(PerformanceMetric).where(
+                PerformanceMetric.agent_id == agent_id
+            ).order_by(PerformanceMetric.timestamp.desc()).limit(10)
+        )
+        recent_metrics = result.all()
     
     return {
         "agent_id": agent_id,
         "agent_name": agent.name,
-        "total_metrics_count": len(metrics),
         "time_period": time_period,
-        "metrics_by_name": metrics_by_name,
         "recent_metrics": recent_metrics,
-        "trend_data": trend_data
+        **aggregates
     }
 
 @router.get("/metrics/summary/session/{session_id}", response_model=schemas.SessionPerformanceSummary)
-def get_session_performance_summary(
+async def get_session_performance_summary(
     session_id: int,
-    db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Get a summary of performance metrics for a specific session
     """
     # Verify the session exists and user has access
-    session = db.query(models.Session).filter(models.Session.id == session_id).first()
+    session = await db.get(models.Session, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
     if session.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to access metrics for this session")
     
-    # Get all metrics for this session
-    metrics = db.query(PerformanceMetric).filter(PerformanceMetric.session_id == session_id).all()
-    
-    if not metrics:
-        return {
-            "session_id": session_id,
-            "session_name": session.name,
-            "total_metrics_count": 0,
-            "metrics_by_name": {},
-            "metrics_by_agent": {},
-            "recent_metrics": []
-        }
-    
-    # Group metrics by name and calculate statistics
-    metrics_by_name = {}
-    for metric in metrics:
-        if metric.metric_name not in metrics_by_name:
-            metrics_by_name[metric.metric_name] = {
-                "count": 0,
-                "sum": 0,
-                "min": float('inf'),
-                "max": float('-inf'),
-                "values": []
-            }
-        
-        metrics_by_name[metric.metric_name]["count"] += 1
-        metrics_by_name[metric.metric_name]["sum"] += metric.metric_value
-        metrics_by_name[metric.metric_name]["min"] = min(metrics_by_name[metric.metric_name]["min"], metric.metric_value)
-        metrics_by_name[metric.metric_name]["max"] = max(metrics_by_name[metric.metric_name]["max"], metric.metric_value)
-        metrics_by_name[metric.metric_name]["values"].append(metric.metric_value)
-    
-    # Calculate averages and clean up
-    for name, stats in metrics_by_name.items():
-        stats["avg"] = stats["sum"] / stats["count"]
-        # Remove the values list as it's not needed in the response
-        del stats["values"]
+    result = await db.execute(
+        select(func.max(PerformanceMetric.timestamp), func.count(PerformanceMetric.id)).where(
+            PerformanceMetric.session_id == session_id
+        )
+    )
+    etag = _summary_etag(session.name, *result.one())
     
-    # Group metrics by agent
-    metrics_by_agent = {}
-    for metric in metrics:
-        agent = db.query(models.Agent).filter(models.Agent.id == metric.agent_id).first()
-        agent_name = agent.name if agent else f"Agent {metric.agent_id}"
-        
-        if agent_name not in metrics_by_agent:
-            metrics_by_agent[agent_name] = {
-                "count": 0,
-                "metrics": {}
-            }
-        
-        metrics_by_agent[agent_name]["count"] += 1
-        
-        if metric.metric_name not in metrics_by_agent[agent_name]["metrics"]:
-            metrics_by_agent[agent_name]["metrics"][metric.metric_name] = {
-                "count": 0,
-                "sum": 0,
-                "values": []
-            }
-        
-        metrics_by_agent[agent_name]["metrics"][metric.metric_name]["count"] += 1
-        metrics_by_agent[agent_name]["metrics"][metric.metric_name]["sum"] += metric.metric_value
-        metrics_by_agent[agent_name]["metrics"][metric.metric_name]["values"].append(metric.metric_value)
+    headers = _summary_cache_headers(etag)
+    if _is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
     
-    # Calculate averages for agent metrics and clean up
-    for agent_name, agent_stats in metrics_by_agent.items():
-        for metric_name, metric_stats in agent_stats["metrics"].items():
-            metric_stats["avg"] = metric_stats["sum"] / metric_stats["count"]
-            # Remove the values list as it's not needed in the response
-            del metric_stats["values"]
+    cache_key = ("session", current_user.id, session_id, etag)
+    aggregates = _get_cached_summary(cache_key)
+    if aggregates is None:
+        aggregates = await _session_summary_aggregates(db, session_id)
+        _cache_summary(cache_key, aggregates)
     
     # Get recent metrics
-    recent_metrics = db.query(PerformanceMetric).filter(
-        PerformanceMetric.session_id == session_id
-    ).order_by(PerformanceMetric.timestamp.desc()).limit(10).all()
+    recent_metrics = []
+    if aggregates["total_metrics_count"]:
+        result = await db.scalars(
+            select(PerformanceMetric).where(
+                PerformanceMetric.session_id == session_id
+            ).order_by(PerformanceMetric.timestamp.desc()).limit(10)
+        )
+        recent_metrics = result.all()
     
     return {
         "session_id": session_id,
         "session_name": session.name,
-        "total_metrics_count": len(metrics),
-        "metrics_by_name": metrics_by_name,
-        "metrics_by_agent": metrics_by_agent,
-        "recent_metrics": recent_metrics
+        "recent_metrics": recent_metrics,
+        **aggregates
     }
 
 @router.post("/metrics/calculate", status_code=status.HTTP_204_NO_CONTENT)
 async def calculate_performance_metrics(
     calculation_request: schemas.MetricCalculationRequest,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Calculate and store performance metrics for an agent or session
     """
     # Verify the agent exists and user has access
-    agent = db.query(models.Agent).filter(models.Agent.id == calculation_request.agent_id).first()
+    agent = db.get(models.Agent, calculation_request.agent_id)
     if not agent:
         raise HTTPException(status_code=404, detail="Agent not found")
     
@@ -375,7 +482,7 @@ async def calculate_performance_metrics(
     # If session_id is provided, verify it exists and user has access
     session = None
     if calculation_request.session_id:
-        session = db.query(models.Session).filter(models.Session.id == calculation_request.session_id).first()
+        session = db.get(models.Session, calculation_request.session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
@@ -2,12 +2,17 @@
 Database models for Advanced Prompt Engineering Tools
 """
 
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Table, Float, JSON
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Table, Float, Index, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from sqlalchemy.dialects.postgresql import JSONB
 
 from app.database import Base
 
+def _jsonb_gin_index(table: str, column: str) -> Index:
+    """GIN index serving containment (@>) filters on a JSONB column."""
+    return Index(f'ix_{table}_{column}_gin', column, postgresql_using='gin', postgresql_ops={column: 'jsonb_path_ops'})
+
 # Association table for prompt templates and tags
 prompt_template_tags = Table(
     'prompt_template_tags',
@@ -30,12 +35,15 @@ class PromptTemplate(Base):
     A prompt template with variables that can be filled in.
     """
     __tablename__ = 'prompt_templates'
+    __table_args__ = (
+        _jsonb_gin_index('prompt_templates', 'variables'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False)
     description = Column(Text)
     template_text = Column(Text, nullable=False)
-    variables = Column(JSON)  # List of variable names and descriptions
+    variables = Column(JSONB)  # List of variable names and descriptions
     default_values = Column(JSON)  # Default values for variables
     is_public = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -81,7 +89,14 @@ class PromptChain(Base):
     
     # Relationships
     creator = relationship("User", back_populates="prompt_chains")
-    templates = relationship("PromptTemplate", secondary=prompt_chain_templates, back_populates="chains")
+    # Chain steps in order, loaded with the chain; PromptTemplate.chains stays lazy
+    templates = relationship(
+        "PromptTemplate",
+        secondary=prompt_chain_templates,
+        back_populates="chains",
+        order_by=prompt_chain_templates.c.order_index,
+        lazy="selectin"
+    )
     test_results = relationship("ChainTestResult", back_populates="chain")
     usage_analytics = relationship("ChainUsageAnalytics", back_populates="chain")
 
@@ -91,13 +106,17 @@ class PromptTestResult(Base):
     Results from testing a prompt template with different parameters.
     """
     __tablename__ = 'prompt_test_results'
+    __table_args__ = (
+        _jsonb_gin_index('prompt_test_results', 'parameters'),
+        _jsonb_gin_index('prompt_test_results', 'variables_used'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     template_id = Column(Integer, ForeignKey('prompt_templates.id'))
     user_id = Column(Integer, ForeignKey('users.id'))
     model = Column(String(100))  # AI model used for testing
-    parameters = Column(JSON)  # Model parameters (temperature, etc.)
-    variables_used = Column(JSON)  # Variable values used in this test
+    parameters = Column(JSONB)  # Model parameters (temperature, etc.)
+    variables_used = Column(JSONB)  # Variable values used in this test
     prompt_text = Column(Text)  # The final prompt text after variable substitution
     response_text = Column(Text)  # The response from the AI model
     execution_time = Column(Float)  # Time taken to generate response in seconds
@@ -139,6 +158,13 @@ class PromptUsageAnalytics(Base):
     Analytics data for prompt template usage.
     """
     __tablename__ = 'prompt_usage_analytics'
+    __table_args__ = (
+        _jsonb_gin_index('prompt_usage_analytics', 'parameters'),
+        _jsonb_gin_index('prompt_usage_analytics', 'variables_used'),
+        # Dashboards aggregate per template or per user over a created_at range
+        Index('ix_prompt_usage_analytics_template_id_created_at', 'template_id', 'created_at'),
+        Index('ix_prompt_usage_analytics_user_id_created_at', 'user_id', 'created_at'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     template_id = Column(Integer, ForeignKey('prompt_templates.id'))
@@ -146,8 +172,8 @@ class PromptUsageAnalytics(Base):
     agent_id = Column(Integer, ForeignKey('agents.id'), nullable=True)
     session_id = Column(Integer, ForeignKey('sessions.id'), nullable=True)
     model = Column(String(100))
-    parameters = Column(JSON)
-    variables_used = Column(JSON)
+    parameters = Column(JSONB)
+    variables_used = Column(JSONB)
     execution_time = Column(Float)
     token_count = Column(Integer)
     success = Column(Boolean, default=True)
@@ -165,6 +191,11 @@ class ChainUsageAnalytics(Base):
     Analytics data for prompt chain usage.
     """
     __tablename__ = 'chain_usage_analytics'
+    __table_args__ = (
+        _jsonb_gin_index('chain_usage_analytics', 'input_variables'),
+        Index('ix_chain_usage_analytics_chain_id_created_at', 'chain_id', 'created_at'),
+        Index('ix_chain_usage_analytics_user_id_created_at', 'user_id', 'created_at'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     chain_id = Column(Integer, ForeignKey('prompt_chains.id'))
@@ -172,9 +203,9 @@ class ChainUsageAnalytics(Base):
     agent_id = Column(Integer, ForeignKey('agents.id'), nullable=True)
     session_id = Column(Integer, ForeignKey('sessions.id'), nullable=True)
     model = Column(String(100))
-    parameters = Column(JSON)
-    input_variables = Column(JSON)
-    step_execution_times = Column(JSON)  # Time taken for each step
+    parameters = Column(JSONB)
+    input_variables = Column(JSONB)
+    step_execution_times = Column(JSONB)  # Time taken for each step
     total_execution_time = Column(Float)  # Total time for the chain
     total_token_count = Column(Integer)
     success = Column(Boolean, default=True)
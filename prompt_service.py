@@ -2,12 +2,15 @@
 Services for Advanced Prompt Engineering Tools
 """
 
+import asyncio
 import json
+import re
 import time
 import logging
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, insert, literal, or_, select
+from sqlalchemy.orm import Session, raiseload, selectinload
 from fastapi import HTTPException
 
 from app.models.prompt_models import (
@@ -19,8 +22,11 @@ from app.models.prompt_models import (
     PromptUsageAnalytics,
     ChainUsageAnalytics,
     PromptLibraryItem,
-    PromptLibraryReview
+    PromptLibraryReview,
+    prompt_chain_templates,
+    prompt_template_tags
 )
+from app.database import STRICT_ORM_LOADING, SessionLocal
 from app.services.ai.unified_service import UnifiedAIService
 
 # Initialize logging
@@ -29,6 +35,102 @@ logger = logging.getLogger(__name__)
 # Initialize AI service
 ai_service = UnifiedAIService()
 
+# Template variables look like {{variable_name}} or {variable_name}
+VARIABLE_PATTERN = re.compile(r'\{\{([^}]+)\}\}|\{([^}]+)\}')
+
+
+class UsageAnalyticsBuffer:
+    """
+    Background writer for template usage analytics, and the one place usage rows are built.
+    Rows are queued as dicts and written with one multi-row INSERT per batch: up to
+    FLUSH_SIZE rows, or whatever arrived within FLUSH_INTERVAL seconds of the first.
+    """
+    
+    FLUSH_SIZE = 50
+    FLUSH_INTERVAL = 0.2
+    
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def record(
+        self,
+        template_id: int,
+        user_id: int,
+        model: str,
+        parameters: Dict[str, Any],
+        variables_used: Dict[str, str],
+        execution_time: float,
+        token_count: int,
+        success: bool,
+        agent_id: Optional[int] = None,
+        session_id: Optional[int] = None
+    ):
+        """Queue one PromptUsageAnalytics row, starting the writer if needed."""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self._queue.put_nowait({
+            "template_id": template_id,
+            "user_id": user_id,
+            "agent_id": agent_id,
+            "session_id": session_id,
+            "model": model,
+            "parameters": parameters,
+            "variables_used": variables_used,
+            "execution_time": execution_time,
+            "token_count": token_count,
+            "success": success,
+        })
+    
+    async def drain(self):
+        """Write every queued row and stop the writer; called at shutdown."""
+        if self._task is None or self._task.done():
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is None:
+                return
+            rows = [row]
+            deadline = loop.time() + self.FLUSH_INTERVAL
+            while len(rows) < self.FLUSH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                # None is the stop marker from drain(); write what was gathered, then exit
+                if row is None:
+                    stopping = True
+                    break
+                rows.append(row)
+            
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception as e:
+                logger.error(f"Error writing {len(rows)} prompt usage analytics rows: {e}")
+    
+    @staticmethod
+    def _write(rows: List[Dict[str, Any]]):
+        db = SessionLocal()
+        try:
+            db.execute(insert(PromptUsageAnalytics), rows)
+            db.commit()
+        finally:
+            db.close()
+
+
+usage_analytics = UsageAnalyticsBuffer()
+
 class PromptTemplateService:
     """Service for managing prompt templates."""
     
@@ -50,43 +152,41 @@ class PromptTemplateService:
             variables = PromptTemplateService._extract_variables(template_text)
         
         # Create template
-        template = PromptTemplate(
-            title=title,
-            description=description,
-            template_text=template_text,
-            variables=variables,
-            default_values=default_values or {},
-            is_public=is_public,
-            creator_id=creator_id
+        template = db.scalar(
+            insert(PromptTemplate).values(
+                title=title,
+                description=description,
+                template_text=template_text,
+                variables=variables,
+                default_values=default_values or {},
+                is_public=is_public,
+                creator_id=creator_id
+            ).returning(PromptTemplate)
         )
         
-        db.add(template)
-        db.commit()
-        
-        # Add tags if provided
+        # Add tags if provided, skipping ids that don't exist, in the same statement
         if tag_ids:
-            tags = db.query(PromptTag).filter(PromptTag.id.in_(tag_ids)).all()
-            template.tags = tags
-            db.commit()
-            
+            db.execute(
+                insert(prompt_template_tags).from_select(
+                    ["prompt_template_id", "prompt_tag_id"],
+                    select(literal(template.id), PromptTag.id).where(PromptTag.id.in_(tag_ids))
+                )
+            )
+        
+        # One commit for the template and its tags; the commit expires the row, so reload it here
+        db.commit()
         db.refresh(template)
         return template
     
     @staticmethod
     def _extract_variables(template_text: str) -> List[Dict[str, str]]:
         """Extract variables from a template string."""
-        import re
-        
-        # Look for patterns like {{variable_name}} or {variable_name}
-        pattern = r'\{\{([^}]+)\}\}|\{([^}]+)\}'
-        matches = re.findall(pattern, template_text)
-        
         variables = []
         seen_vars = set()
         
-        for match in matches:
-            # Each match is a tuple with one empty string and one variable name
-            var_name = match[0] if match[0] else match[1]
+        for match in VARIABLE_PATTERN.finditer(template_text):
+            # Exactly one of the two groups is set, depending on the brace style
+            var_name = match.group(1) or match.group(2)
             
             # Skip duplicates
             if var_name in seen_vars:
@@ -106,22 +206,35 @@ class PromptTemplateService:
         db: Session,
         user_id: int,
         include_public: bool = True,
-        tag_ids: Optional[List[int]] = None
+        tag_ids: Optional[List[int]] = None,
+        *,
+        cursor: int = 0,
+        limit: int = 50
     ) -> List[PromptTemplate]:
-        """Get all templates accessible by a user."""
-        query = db.query(PromptTemplate).filter(PromptTemplate.creator_id == user_id)
-        
+        """
+        Get a page of templates accessible by a user, ordered by id.
+        Pass the last returned id as `cursor` to fetch the next page.
+        """
         if include_public:
-            query = query.union(
-                db.query(PromptTemplate).filter(PromptTemplate.is_public == True)
-            )
+            access = or_(PromptTemplate.creator_id == user_id, PromptTemplate.is_public == True)
+        else:
+            access = PromptTemplate.creator_id == user_id
+        query = db.query(PromptTemplate).filter(access, PromptTemplate.id > cursor)
             
-        # Filter by tags if specified
+        # Filter by tags if specified: keep templates carrying every requested tag
         if tag_ids:
-            for tag_id in tag_ids:
-                query = query.filter(PromptTemplate.tags.any(id=tag_id))
-                
-        return query.all()
+            tag_ids = set(tag_ids)
+            query = query.join(PromptTemplate.tags).filter(
+                PromptTag.id.in_(tag_ids)
+            ).group_by(PromptTemplate.id).having(
+                func.count(func.distinct(PromptTag.id)) == len(tag_ids)
+            )
+        
+        # Tags are rendered with every template; load them for all templates in one query
+        options = [selectinload(PromptTemplate.tags)]
+        if STRICT_ORM_LOADING:
+            options.append(raiseload("*"))
+        return query.options(*options).order_by(PromptTemplate.id).limit(limit).all()
     
     @staticmethod
     async def get_template(
@@ -214,16 +327,16 @@ class PromptTemplateService:
         variables: Dict[str, str]
     ) -> str:
         """Render a prompt template with the provided variables."""
-        rendered_text = template.template_text
-        
-        # Replace variables in the template
+        values = {}
         for var in template.variables:
             var_name = var["name"]
-            placeholder = f"{{{{{var_name}}}}}" if "{{" in template.template_text else f"{{{var_name}}}"
-            value = variables.get(var_name, template.default_values.get(var_name, f"[{var_name}]"))
-            rendered_text = rendered_text.replace(placeholder, value)
-            
-        return rendered_text
+            values[var_name] = variables.get(var_name, template.default_values.get(var_name, f"[{var_name}]"))
+        
+        # One pass over the text for both brace styles; undeclared placeholders are left as written
+        return VARIABLE_PATTERN.sub(
+            lambda match: values.get(match.group(1) or match.group(2), match.group(0)),
+            template.template_text
+        )
     
     @staticmethod
     async def test_template(
@@ -243,10 +356,11 @@ class PromptTemplateService:
         # Render template
         prompt_text = await PromptTemplateService.render_template(template, variables)
         
-        # Generate response using AI service
+        # Generate response using AI service; the provider client is blocking, so keep it off the event loop
         start_time = time.time()
         try:
-            response = ai_service.generate_text(
+            response = await asyncio.to_thread(
+                ai_service.generate_text,
                 prompt=prompt_text,
                 model=model,
                 **parameters
@@ -277,13 +391,10 @@ class PromptTemplateService:
         db.commit()
         db.refresh(test_result)
         
-        # Record usage analytics
-        await PromptAnalyticsService.record_template_usage(
-            db=db,
+        # Record usage analytics; written in the background, batched with other tests
+        usage_analytics.record(
             template_id=template_id,
             user_id=user_id,
-            agent_id=None,
-            session_id=None,
             model=model,
             parameters=parameters,
             variables_used=variables,
@@ -332,6 +443,10 @@ class PromptChainService:
         is_public: bool = False
     ) -> PromptChain:
         """Create a new prompt chain."""
+        # Check if user has access to all templates before creating anything
+        if template_ids:
+            PromptChainService._check_template_access(db, template_ids, creator_id)
+        
         chain = PromptChain(
             title=title,
             description=description,
@@ -340,52 +455,66 @@ class PromptChainService:
         )
         
         db.add(chain)
-        db.commit()
+        db.flush()
         
-        # Add templates if provided
+        # Add templates to chain with order
         if template_ids:
-            templates = db.query(PromptTemplate).filter(PromptTemplate.id.in_(template_ids)).all()
-            
-            # Check if user has access to all templates
-            for template in templates:
-                if template.creator_id != creator_id and not template.is_public:
-                    raise HTTPException(status_code=403, detail=f"You don't have access to template: {template.title}")
-            
-            # Add templates to chain with order
-            for i, template_id in enumerate(template_ids):
-                # Find the template in our list
-                template = next((t for t in templates if t.id == template_id), None)
-                if template:
-                    # Add to association table with order
-                    db.execute(
-                        "INSERT INTO prompt_chain_templates (prompt_chain_id, prompt_template_id, order_index) VALUES (:chain_id, :template_id, :order_index)",
-                        {
-                            "chain_id": chain.id,
-                            "template_id": template_id,
-                            "order_index": i
-                        }
-                    )
-            
-            db.commit()
-            
+            PromptChainService._link_templates(db, chain.id, template_ids)
+        
+        db.commit()
         db.refresh(chain)
         return chain
     
+    @staticmethod
+    def _check_template_access(db: Session, template_ids: List[int], user_id: int):
+        """Raise 403 unless every template exists and is owned by the user or public."""
+        accessible_ids = set(db.scalars(
+            select(PromptTemplate.id).where(
+                PromptTemplate.id.in_(template_ids),
+                or_(PromptTemplate.creator_id == user_id, PromptTemplate.is_public == True)
+            )
+        ).all())
+        
+        missing_ids = sorted(set(template_ids) - accessible_ids)
+        if missing_ids:
+            raise HTTPException(
+                status_code=403,
+                detail=f"You don't have access to templates: {', '.join(map(str, missing_ids))}"
+            )
+    
+    @staticmethod
+    def _link_templates(db: Session, chain_id: int, template_ids: List[int]):
+        """Link templates to a chain in the requested order with one multi-row INSERT."""
+        rows = [
+            {"prompt_chain_id": chain_id, "prompt_template_id": template_id, "order_index": i}
+            for i, template_id in enumerate(template_ids)
+        ]
+        if rows:
+            db.execute(insert(prompt_chain_templates), rows)
+    
     @staticmethod
     async def get_chains(
         db: Session,
         user_id: int,
-        include_public: bool = True
+        include_public: bool = True,
+        *,
+        cursor: int = 0,
+        limit: int = 50
     ) -> List[PromptChain]:
-        """Get all chains accessible by a user."""
-        query = db.query(PromptChain).filter(PromptChain.creator_id == user_id)
-        
+        """
+        Get a page of chains accessible by a user, ordered by id.
+        Pass the last returned id as `cursor` to fetch the next page.
+        """
         if include_public:
-            query = query.union(
-                db.query(PromptChain).filter(PromptChain.is_public == True)
-            )
-                
-        return query.all()
+            access = or_(PromptChain.creator_id == user_id, PromptChain.is_public == True)
+        else:
+            access = PromptChain.creator_id == user_id
+        query = db.query(PromptChain).filter(access, PromptChain.id > cursor)
+        
+        options = [selectinload(PromptChain.templates)]
+        if STRICT_ORM_LOADING:
+            options.append(raiseload("*"))
+        return query.options(*options).order_by(PromptChain.id).limit(limit).all()
     
     @staticmethod
     async def get_chain(
@@ -434,34 +563,13 @@ class PromptChainService:
             
         # Update templates if provided
         if template_ids is not None:
-            # Clear existing templates
-            db.execute(
-                "DELETE FROM prompt_chain_templates WHERE prompt_chain_id = :chain_id",
-                {"chain_id": chain.id}
-            )
-            
-            # Add new templates
-            templates = db.query(PromptTemplate).filter(PromptTemplate.id.in_(template_ids)).all()
-            
-            # Check if user has access to all templates
-            for template in templates:
-                if template.creator_id != user_id and not template.is_public:
-                    raise HTTPException(status_code=403, detail=f"You don't have access to template: {template.title}")
+            # Check if user has access to all templates before touching the existing links
+            if template_ids:
+                PromptChainService._check_template_access(db, template_ids, user_id)
             
-            # Add templates to chain with order
-            for i, template_id in enumerate(template_ids):
-                # Find the template in our list
-                template = next((t for t in templates if t.id == template_id), None)
-                if template:
-                    # Add to association table with order
-                    db.execute(
-                        "INSERT INTO prompt_chain_templates (prompt_chain_id, prompt_template_id, order_index) VALUES (:chain_id, :template_id, :order_index)",
-                        {
-                            "chain_id": chain.id,
-                            "template_id": template_id,
-                            "order_index": i
-                        }
-                    )
+            # Replace the chain's templates: one DELETE and one multi-row INSERT, committed together
+            db.execute(delete(prompt_chain_templates).where(prompt_chain_templates.c.prompt_chain_id == chain.id))
+            PromptChainService._link_templates(db, chain.id, template_ids)
             
         db.commit()
         db.refresh(chain)
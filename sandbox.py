@@ -11,7 +11,7 @@ router = APIRouter()
 
 @router.post("/start", response_model=schemas.Session)
 def start_sandbox(session_data: schemas.SessionCreate, db: Session = Depends(get_db), 
-                 current_user: schemas.User = Depends(auth.get_current_user)):
+                 current_user: schemas.CurrentUser = Depends(auth.get_current_user)):
     """
     Start a new sandbox session
     """
@@ -28,7 +28,7 @@ def start_sandbox(session_data: schemas.SessionCreate, db: Session = Depends(get
 
 @router.get("/sessions", response_model=List[schemas.Session])
 def get_sessions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), 
-                current_user: schemas.User = Depends(auth.get_current_user)):
+                current_user: schemas.CurrentUser = Depends(auth.get_current_user)):
     """
     Get all sandbox sessions for the current user
     """
@@ -39,7 +39,7 @@ def get_sessions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db),
 
 @router.get("/sessions/{session_id}", response_model=schemas.Session)
 def get_session(session_id: int, db: Session = Depends(get_db), 
-               current_user: schemas.User = Depends(auth.get_current_user)):
+               current_user: schemas.CurrentUser = Depends(auth.get_current_user)):
     """
     Get a specific sandbox session
     """
@@ -54,7 +54,7 @@ def get_session(session_id: int, db: Session = Depends(get_db),
 @router.post("/sessions/{session_id}/agents", status_code=status.HTTP_201_CREATED)
 def add_agent_to_session(session_id: int, agent_id: int, is_manager: bool = False, 
                         db: Session = Depends(get_db), 
-                        current_user: schemas.User = Depends(auth.get_current_user)):
+                        current_user: schemas.CurrentUser = Depends(auth.get_current_user)):
     """
     Add an agent to a sandbox session
     """
@@ -105,7 +105,7 @@ def add_agent_to_session(session_id: int, agent_id: int, is_manager: bool = Fals
 @router.post("/sessions/{session_id}/message", response_model=schemas.Message)
 async def send_message(session_id: int, message: schemas.MessageCreate, 
                      db: Session = Depends(get_db), 
-                     current_user: schemas.User = Depends(auth.get_current_user)):
+                     current_user: schemas.CurrentUser = Depends(auth.get_current_user)):
     """
     Send a message in a sandbox session
     """
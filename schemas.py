@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
@@ -75,6 +75,59 @@ class User(UserBase):
     class Config:
         orm_mode = True
 
+class CurrentUser(BaseModel):
+    """The authenticated user as resolved (and cached) by get_current_user; not an ORM row."""
+    id: int
+    username: str
+    is_active: bool
+
+class TeamListItem(BaseModel):
+    id: int
+    name: str
+    owner_id: int
+    is_public: bool
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+class PerformanceMetricBase(BaseModel):
+    agent_id: int
+    session_id: Optional[int] = None
+    metric_name: str
+    metric_value: float
+    # Read from PerformanceMetric.meta (`metadata` is reserved on ORM classes), still serialized as "metadata"
+    metadata: Optional[Dict[str, Any]] = Field(None, validation_alias=AliasChoices("meta", "metadata"))
+
+class PerformanceMetricCreate(PerformanceMetricBase):
+    pass
+
+class PerformanceMetric(PerformanceMetricBase):
+    id: int
+    timestamp: datetime
+
+    class Config:
+        orm_mode = True
+
+class KnowledgeItemResponse(BaseModel):
+    id: int
+    title: str
+    content: Optional[str] = None
+    content_type: Optional[str] = None
+    source_url: Optional[str] = None
+    source_type: Optional[str] = None
+    importance: Optional[float] = None
+    # Read from KnowledgeItem.meta (`metadata` is reserved on ORM classes), still serialized as "metadata"
+    metadata: Optional[Dict[str, Any]] = Field(None, validation_alias=AliasChoices("meta", "metadata"))
+    embedding_status: Optional[str] = None
+    repository_id: int
+    creator_id: Optional[int] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
 class Token(BaseModel):
     access_token: str
     token_type: str
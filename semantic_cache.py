@@ -0,0 +1,131 @@
+"""
+Semantic cache for knowledge search results.
+Exact repeats of a query are served by hash; paraphrased queries are served when
+their embedding is close enough to a cached query embedding.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional
+
+import numpy as np
+
+
+class SemanticCache:
+    """In-process LRU cache of search results with exact and cosine-threshold lookup."""
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 300.0, threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        # key -> (slot, scope, repository_id, value, expires_at), in LRU order
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Unit-normalized query embeddings, one row per slot
+        self._matrix: Optional[np.ndarray] = None
+        self._slot_keys: List[Optional[str]] = [None] * max_entries
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+
+    @staticmethod
+    def _key(query: str, scope: Hashable) -> str:
+        return hashlib.sha1(f"{scope!r}\x00{query}".encode("utf-8")).hexdigest()
+
+    def get(self, query: str, scope: Hashable) -> Optional[Any]:
+        """Return the cached value for this exact query and scope, if fresh."""
+        key = self._key(query, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[4] < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[3]
+
+    def get_similar(self, embedding: List[float], scope: Hashable) -> Optional[Any]:
+        """Return the value of the most similar cached query in the same scope, if above the threshold."""
+        query_vec = self._normalize(embedding)
+        if query_vec is None:
+            return None
+
+        with self._lock:
+            if self._matrix is None or not self._entries or self._matrix.shape[1] != query_vec.shape[0]:
+                return None
+
+            # Cached rows are unit vectors, so one matrix-vector product gives every cosine
+            similarities = self._matrix @ query_vec
+            candidates = np.flatnonzero(similarities >= self.threshold)
+            now = time.monotonic()
+
+            best_key, best_similarity = None, -1.0
+            for slot in candidates:
+                key = self._slot_keys[slot]
+                if key is None:
+                    continue
+                entry = self._entries[key]
+                if entry[1] != scope or entry[4] < now:
+                    continue
+                if similarities[slot] > best_similarity:
+                    best_key, best_similarity = key, similarities[slot]
+
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key][3]
+
+    def put(self, query: str, embedding: List[float], scope: Hashable, value: Any, repository_id: Optional[int] = None):
+        """Cache a value for a query. `repository_id` scopes later invalidation."""
+        key = self._key(query, scope)
+        query_vec = self._normalize(embedding)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while not self._free_slots:
+                self._remove(next(iter(self._entries)))
+
+            slot = self._free_slots.pop()
+            if query_vec is not None:
+                if self._matrix is None or self._matrix.shape[1] != query_vec.shape[0]:
+                    self._matrix = np.zeros((self.max_entries, query_vec.shape[0]), dtype=np.float32)
+                self._matrix[slot] = query_vec
+            elif self._matrix is not None:
+                self._matrix[slot] = 0.0
+
+            self._slot_keys[slot] = key
+            self._entries[key] = (slot, scope, repository_id, value, time.monotonic() + self.ttl_seconds)
+
+    def invalidate_repository(self, repository_id: int):
+        """Drop entries that may contain items of the repository, including unscoped searches."""
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if entry[2] is None or entry[2] == repository_id
+            ]
+            for key in stale:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def _remove(self, key: str):
+        slot = self._entries.pop(key)[0]
+        self._slot_keys[slot] = None
+        if self._matrix is not None:
+            self._matrix[slot] = 0.0
+        self._free_slots.append(slot)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+        if embedding is None or len(embedding) == 0:
+            return None
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm == 0:
+            return None
+        return vec / norm
@@ -0,0 +1,68 @@
+"""
+Redis-backed exact-match cache of knowledge search results, shared by all workers.
+Keys embed a per-repository generation counter, so invalidating a repository is a
+single INCR and stale entries simply age out.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Hashable, List, Optional
+
+from redis import RedisError
+
+from app.cache import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Generation bumped on every invalidation; searches across all repositories key on it
+ALL_REPOSITORIES = "all"
+
+
+class SharedSearchCache:
+    """Exact-repeat search results in Redis, invalidated per repository by generation."""
+
+    def __init__(self, ttl_seconds: int = 300):
+        self.ttl_seconds = ttl_seconds
+
+    @staticmethod
+    def _generation_key(repository_id: Optional[int]) -> str:
+        return f"search:gen:{ALL_REPOSITORIES if repository_id is None else repository_id}"
+
+    def _key(self, query: str, scope: Hashable, repository_id: Optional[int]) -> str:
+        generation = redis_client.get(self._generation_key(repository_id)) or b"0"
+        digest = hashlib.sha256(f"{scope!r}\x00{query}".encode("utf-8")).hexdigest()
+        return f"search:exact:{generation.decode()}:{digest}"
+
+    def get(self, query: str, scope: Hashable, repository_id: Optional[int] = None) -> Optional[List[int]]:
+        try:
+            cached = redis_client.get(self._key(query, scope, repository_id))
+        except RedisError as e:
+            logger.warning(f"Search cache unavailable: {e}")
+            return None
+        return None if cached is None else json.loads(cached)
+
+    def put(self, query: str, scope: Hashable, item_ids: List[int], repository_id: Optional[int] = None):
+        try:
+            redis_client.setex(self._key(query, scope, repository_id), self.ttl_seconds, json.dumps(item_ids))
+        except RedisError as e:
+            logger.warning(f"Search cache unavailable: {e}")
+
+    def invalidate_repository(self, repository_id: Optional[int]):
+        """Retire cached searches over the repository and every unscoped search."""
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            if repository_id is not None:
+                pipe.incr(self._generation_key(repository_id))
+            pipe.incr(self._generation_key(None))
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Search cache unavailable: {e}")
+
+    def clear(self):
+        try:
+            keys = list(redis_client.scan_iter(match="search:exact:*", count=1000))
+            if keys:
+                redis_client.delete(*keys)
+        except RedisError as e:
+            logger.warning(f"Search cache unavailable: {e}")
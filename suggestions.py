@@ -15,7 +15,7 @@ router = APIRouter()
 def create_improvement_suggestion(
     suggestion: schemas.ImprovementSuggestionCreate,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Create a new improvement suggestion for an agent
@@ -53,7 +53,7 @@ def read_improvement_suggestions(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve improvement suggestions with optional filtering
@@ -89,7 +89,7 @@ def read_improvement_suggestions(
 def read_improvement_suggestion_by_id(
     suggestion_id: int,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve a specific improvement suggestion
@@ -110,7 +110,7 @@ def read_improvement_suggestion_by_id(
 def implement_suggestion(
     suggestion_id: int,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Mark a suggestion as implemented
@@ -137,7 +137,7 @@ def implement_suggestion(
 def delete_improvement_suggestion(
     suggestion_id: int,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Delete an improvement suggestion
@@ -161,7 +161,7 @@ def delete_improvement_suggestion(
 async def generate_improvement_suggestions(
     generation_request: schemas.SuggestionGenerationRequest,
     db: Session = Depends(get_db),
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Automatically generate improvement suggestions for an agent based on feedback and performance
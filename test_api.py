@@ -1,6 +1,8 @@
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
@@ -29,6 +31,18 @@ app.dependency_overrides[get_db] = override_get_db
 # Create test client
 client = TestClient(app)
 
+@contextmanager
+def count_queries():
+    """Count the SQL statements executed inside the block."""
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
 @pytest.fixture(scope="function")
 def test_db():
     # Create the database tables
@@ -128,6 +142,38 @@ def test_get_agents(test_db):
     assert len(response.json()) == 1
     assert response.json()[0]["name"] == "Test Agent"
 
+def test_get_agents_query_count_is_constant(test_db):
+    client.post(
+        "/auth/register",
+        json={"username": "testuser", "email": "test@example.com", "password": "password123"},
+    )
+    login_response = client.post(
+        "/auth/token",
+        data={"username": "testuser", "password": "password123"},
+    )
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    agent = {
+        "name": "Test Agent",
+        "role": "Tester",
+        "personality": "Analytical",
+        "system_instructions": "You are a test agent.",
+        "examples": []
+    }
+    
+    client.post("/agents/", json=agent, headers=headers)
+    client.get("/agents/", headers=headers)
+    with count_queries() as one_agent:
+        client.get("/agents/", headers=headers)
+    
+    for _ in range(3):
+        client.post("/agents/", json=agent, headers=headers)
+    with count_queries() as four_agents:
+        response = client.get("/agents/", headers=headers)
+    
+    # Serializing more agents must not issue more queries
+    assert len(response.json()) == 4
+    assert len(four_agents) == len(one_agent)
+
 def test_start_sandbox(test_db):
     # First register, login, and create an agent
     client.post(
@@ -0,0 +1,101 @@
+import pytest
+from redis import RedisError
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import models, schemas
+from app.utils import auth
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.calls = 0
+
+    def get(self, key):
+        self.calls += 1
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.calls += 1
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+class DownRedis(FakeRedis):
+    def get(self, key):
+        self.calls += 1
+        raise RedisError("connection refused")
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(auth, "redis_client", fake)
+    monkeypatch.setattr(auth, "_user_cache_down_until", 0.0)
+    return fake
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(bind=engine)
+    db = TestingSessionLocal()
+    yield db
+    db.close()
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def cached_user(db, redis):
+    user = models.User(username="testuser", email="test@example.com", hashed_password="hashed_password")
+    db.add(user)
+    db.commit()
+    auth._cache_user(schemas.CurrentUser(id=user.id, username=user.username, is_active=True))
+    assert "sess:testuser" in redis.data
+    return user
+
+def test_deactivation_evicts_cached_user(db, redis, cached_user):
+    cached_user.is_active = False
+    db.commit()
+
+    assert "sess:testuser" not in redis.data
+
+def test_password_change_evicts_cached_user(db, redis, cached_user):
+    cached_user.hashed_password = "new_hashed_password"
+    db.commit()
+
+    assert "sess:testuser" not in redis.data
+
+def test_deleting_user_evicts_cached_user(db, redis, cached_user):
+    db.delete(cached_user)
+    db.commit()
+
+    assert "sess:testuser" not in redis.data
+
+def test_rolled_back_deactivation_keeps_cached_user(db, redis, cached_user):
+    cached_user.is_active = False
+    db.flush()
+    db.rollback()
+    # A later, unrelated commit must not act on the discarded change
+    db.commit()
+
+    assert "sess:testuser" in redis.data
+
+def test_unrelated_change_keeps_cached_user(db, redis, cached_user):
+    cached_user.email = "other@example.com"
+    db.commit()
+
+    assert "sess:testuser" in redis.data
+
+def test_lookups_skip_redis_after_a_failure(monkeypatch):
+    down = DownRedis()
+    monkeypatch.setattr(auth, "redis_client", down)
+    monkeypatch.setattr(auth, "_user_cache_down_until", 0.0)
+
+    assert auth._get_cached_user("testuser") is None
+    assert auth._get_cached_user("testuser") is None
+    auth._cache_user(schemas.CurrentUser(id=1, username="testuser", is_active=True))
+
+    assert down.calls == 1
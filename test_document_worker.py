@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.knowledge_models import Document
+from app.services.knowledge import knowledge_service
+from app.services.knowledge.knowledge_service import DocumentService, DocumentWorker
+
+@pytest.fixture(scope="function")
+def document(db, user):
+    document = Document(filename="notes.txt", file_path="/tmp/notes.txt", file_type="txt", uploader_id=user.id, processing_status="queued")
+    db.add(document)
+    db.commit()
+    return document
+
+@pytest.fixture(scope="function")
+def worker_sessions(monkeypatch, pg_sessionmaker):
+    # The worker opens its own sessions on its thread
+    monkeypatch.setattr(knowledge_service, "SessionLocal", pg_sessionmaker)
+
+def test_claim_succeeds_once(db, document):
+    assert DocumentWorker._claim(db, document.id)
+    assert not DocumentWorker._claim(db, document.id)
+
+    db.refresh(document)
+    assert document.processing_status == "processing"
+
+def test_failed_processing_marks_document_failed(db, document, worker_sessions, monkeypatch):
+    async def fail(db, document_id):
+        raise RuntimeError("parser crashed")
+    monkeypatch.setattr(DocumentService, "process_document", fail)
+
+    with pytest.raises(RuntimeError):
+        DocumentWorker._process(document.id)
+
+    db.refresh(document)
+    assert document.processing_status == "failed"
+
+def test_backfill_requeues_only_stale_claims(db, user, document, worker_sessions):
+    stale = Document(filename="stale.txt", file_path="/tmp/stale.txt", uploader_id=user.id, processing_status="processing")
+    fresh = Document(filename="fresh.txt", file_path="/tmp/fresh.txt", uploader_id=user.id, processing_status="processing")
+    db.add_all([stale, fresh])
+    db.flush()
+    stale.updated_at = datetime.now(timezone.utc) - timedelta(seconds=DocumentWorker.STALE_CLAIM_SECONDS + 60)
+    fresh.updated_at = datetime.now(timezone.utc)
+    db.commit()
+
+    assert DocumentWorker._queued_document_ids() == [document.id, stale.id]
+
+def test_requeue_leaves_claimed_documents_alone(db, document):
+    DocumentWorker._claim(db, document.id)
+
+    DocumentWorker.requeue(db, document.id)
+
+    db.refresh(document)
+    assert document.processing_status == "processing"
@@ -0,0 +1,82 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import or_
+
+from app.models.knowledge_models import KnowledgeConnection, KnowledgeItem, KnowledgeRepository, KnowledgeTag
+from app.services.knowledge.knowledge_service import KnowledgeService
+
+# (source, target) pairs between items 1..8; 1-2-5 is a triangle, 7-8 is a separate component
+CONNECTIONS = [(1, 2), (2, 3), (3, 4), (5, 1), (2, 5), (4, 6), (7, 8)]
+
+@pytest.fixture(scope="function")
+def graph_items(db, user):
+    repository = KnowledgeRepository(name="Graph", owner_id=user.id)
+    db.add(repository)
+    db.flush()
+
+    tag = KnowledgeTag(name="core")
+    items = {
+        n: KnowledgeItem(id=n, title=f"Item {n}", content=f"Content {n}", importance=float(n), repository_id=repository.id, creator_id=user.id)
+        for n in range(1, 9)
+    }
+    items[2].tags = [tag]
+    db.add_all(items.values())
+    db.flush()
+    db.add_all([
+        KnowledgeConnection(source_id=source, target_id=target, relationship_type="related", strength=0.5)
+        for source, target in CONNECTIONS
+    ])
+    db.commit()
+
+def previous_traversal(db, central_id, depth):
+    """The level-by-level walk get_knowledge_graph did before the recursive CTE: (node ids, edges)."""
+    node_ids = {central_id}
+    edges = set()
+    level = {central_id}
+    for _ in range(depth):
+        next_level = set()
+        for conn in db.query(KnowledgeConnection).filter(or_(
+            KnowledgeConnection.source_id.in_(level),
+            KnowledgeConnection.target_id.in_(level)
+        )):
+            edges.add((conn.source_id, conn.target_id))
+            next_level.update((conn.source_id, conn.target_id))
+        node_ids |= next_level
+        level = next_level
+        if not level:
+            break
+    return node_ids, edges
+
+def get_graph(db, user, central_id, depth):
+    graph = asyncio.run(KnowledgeService.get_knowledge_graph(
+        db, user_id=user.id, central_item_id=central_id, depth=depth
+    ))
+    return json.loads(graph) if isinstance(graph, str) else graph
+
+@pytest.mark.parametrize("depth", [1, 2])
+def test_graph_matches_previous_traversal(db, user, graph_items, depth):
+    graph = get_graph(db, user, 1, depth)
+    node_ids, edges = previous_traversal(db, 1, depth)
+
+    assert {node["id"] for node in graph["nodes"]} == node_ids
+    node = next(node for node in graph["nodes"] if node["id"] == 2)
+    assert node == {"id": 2, "label": "Item 2", "type": "text", "importance": 2.0, "tags": ["core"]}
+
+    graph_edges = {(edge["source"], edge["target"]) for edge in graph["edges"]}
+    assert edges <= graph_edges
+    # The walk only collected edges of nodes it expanded; the CTE also returns
+    # edges between two nodes on the outermost level, which both end up in the graph
+    outermost = node_ids - previous_traversal(db, 1, depth - 1)[0]
+    assert all(source in outermost and target in outermost for source, target in graph_edges - edges)
+
+def test_graph_depth_one_includes_edges_between_outermost_nodes(db, user, graph_items):
+    graph = get_graph(db, user, 1, 1)
+
+    assert {(edge["source"], edge["target"]) for edge in graph["edges"]} == {(1, 2), (5, 1), (2, 5)}
+
+def test_unbounded_graph_stays_in_connected_component(db, user, graph_items):
+    graph = get_graph(db, user, 1, None)
+
+    assert {node["id"] for node in graph["nodes"]} == {1, 2, 3, 4, 5, 6}
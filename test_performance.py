@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.database import get_async_db
+from app.models import models, schemas
+from app.models.learning_models import PerformanceMetric
+from app.routes import performance
+from app.utils import auth
+
+app = FastAPI()
+app.include_router(performance.router)
+
+client = TestClient(app)
+
+@pytest.fixture(scope="function")
+def agent(pg_engine, db, user):
+    # The performance routes run on AsyncSession; TestClient may run each request on a new
+    # event loop, so async connections are never pooled
+    async_engine = create_async_engine(pg_engine.url.set(drivername="postgresql+asyncpg"), poolclass=NullPool)
+    async_sessionmaker_ = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with async_sessionmaker_() as async_db:
+            yield async_db
+
+    agent = models.Agent(name="Test Agent", role="Tester", personality="Analytical", system_instructions="Test", examples=[], owner_id=user.id)
+    db.add(agent)
+    db.commit()
+    current_user = schemas.CurrentUser(id=user.id, username=user.username, is_active=True)
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[auth.get_current_user] = lambda: current_user
+
+    yield agent
+
+    app.dependency_overrides.clear()
+    performance._summary_cache.clear()
+
+def add_metrics(db, agent, timestamps):
+    metrics = [
+        PerformanceMetric(agent_id=agent.id, metric_name="response_time", metric_value=1.0, timestamp=timestamp)
+        for timestamp in timestamps
+    ]
+    db.add_all(metrics)
+    db.commit()
+    return [metric.id for metric in metrics]
+
+def test_metric_cursor_pages_through_equal_timestamps(db, agent):
+    now = datetime.now(timezone.utc)
+    # Five metrics share a timestamp, so pages of two have to split ties on the id
+    ids = add_metrics(db, agent, [now] * 5 + [now - timedelta(minutes=1), now + timedelta(minutes=1)])
+
+    seen = []
+    cursor = None
+    while True:
+        params = {"agent_id": agent.id, "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/metrics/", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        seen.extend(metric["id"] for metric in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    newest, tied, oldest = ids[6], sorted(ids[:5], reverse=True), ids[5]
+    assert seen == [newest] + tied + [oldest]
+
+def test_metric_cursor_rejects_garbage(agent):
+    response = client.get("/metrics/", params={"agent_id": agent.id, "cursor": "not-a-cursor"})
+
+    assert response.status_code == 400
+
+def test_unchanged_summary_answers_304(db, agent):
+    add_metrics(db, agent, [datetime.now(timezone.utc)])
+    first = client.get(f"/metrics/summary/agent/{agent.id}")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    response = client.get(f"/metrics/summary/agent/{agent.id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+def test_summary_etag_and_body_change_after_another_worker_writes(db, agent):
+    add_metrics(db, agent, [datetime.now(timezone.utc)])
+    first = client.get(f"/metrics/summary/agent/{agent.id}")
+    etag = first.headers["ETag"]
+    assert first.json()["total_metrics_count"] == 1
+
+    # Written straight to the database, as another worker would, bypassing this process's routes
+    add_metrics(db, agent, [datetime.now(timezone.utc)])
+    response = client.get(f"/metrics/summary/agent/{agent.id}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["total_metrics_count"] == 2
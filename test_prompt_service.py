@@ -0,0 +1,100 @@
+import asyncio
+
+from app.models.prompt_models import PromptChain
+from app.services.prompt.prompt_service import PromptChainService, PromptTemplateService, UsageAnalyticsBuffer
+
+def create_templates(db, user_id, count):
+    return [
+        asyncio.run(PromptTemplateService.create_template(
+            db, title=f"Template {n}", template_text=f"Say {{{{word}}}} {n} times", creator_id=user_id
+        )).id
+        for n in range(count)
+    ]
+
+def chain_template_ids(pg_sessionmaker, chain_id):
+    # Fresh session, so the order comes from prompt_chain_templates rather than the identity map
+    db = pg_sessionmaker()
+    try:
+        return [template.id for template in db.get(PromptChain, chain_id).templates]
+    finally:
+        db.close()
+
+def test_create_chain_preserves_template_order(db, pg_sessionmaker, user):
+    first, second, third = create_templates(db, user.id, 3)
+
+    chain = asyncio.run(PromptChainService.create_chain(
+        db, title="Chain", creator_id=user.id, template_ids=[third, first, second]
+    ))
+
+    assert chain_template_ids(pg_sessionmaker, chain.id) == [third, first, second]
+
+def test_update_chain_replaces_template_order(db, pg_sessionmaker, user):
+    first, second, third = create_templates(db, user.id, 3)
+    chain = asyncio.run(PromptChainService.create_chain(
+        db, title="Chain", creator_id=user.id, template_ids=[first, second, third]
+    ))
+
+    asyncio.run(PromptChainService.update_chain(db, chain.id, user.id, template_ids=[second, first]))
+
+    assert chain_template_ids(pg_sessionmaker, chain.id) == [second, first]
+
+def test_get_templates_pages_by_id(db, user):
+    template_ids = create_templates(db, user.id, 5)
+
+    seen = []
+    cursor = 0
+    while True:
+        page = asyncio.run(PromptTemplateService.get_templates(db, user.id, cursor=cursor, limit=2))
+        if not page:
+            break
+        seen.extend(template.id for template in page)
+        cursor = page[-1].id
+
+    assert seen == sorted(template_ids)
+
+def test_get_chains_pages_by_id(db, user):
+    chain_ids = [
+        asyncio.run(PromptChainService.create_chain(db, title=f"Chain {n}", creator_id=user.id)).id
+        for n in range(3)
+    ]
+
+    first_page = asyncio.run(PromptChainService.get_chains(db, user.id, limit=2))
+    second_page = asyncio.run(PromptChainService.get_chains(db, user.id, cursor=first_page[-1].id, limit=2))
+
+    assert [chain.id for chain in first_page + second_page] == chain_ids
+
+def record_usage(buffer, count):
+    for n in range(count):
+        buffer.record(
+            template_id=1, user_id=1, model="test-model", parameters={}, variables_used={"word": str(n)},
+            execution_time=0.1, token_count=n, success=True
+        )
+
+def test_usage_analytics_batches_rows(monkeypatch):
+    batches = []
+    monkeypatch.setattr(UsageAnalyticsBuffer, "_write", staticmethod(batches.append))
+    buffer = UsageAnalyticsBuffer()
+
+    async def run():
+        record_usage(buffer, 120)
+        await asyncio.sleep(UsageAnalyticsBuffer.FLUSH_INTERVAL * 2)
+
+    asyncio.run(run())
+
+    assert [len(batch) for batch in batches] == [50, 50, 20]
+    assert [row["token_count"] for batch in batches for row in batch] == list(range(120))
+
+def test_usage_analytics_drain_writes_queued_rows(monkeypatch):
+    batches = []
+    monkeypatch.setattr(UsageAnalyticsBuffer, "_write", staticmethod(batches.append))
+    buffer = UsageAnalyticsBuffer()
+
+    async def run():
+        record_usage(buffer, 3)
+        # Well inside FLUSH_INTERVAL, so nothing has been written yet
+        await buffer.drain()
+
+    asyncio.run(run())
+
+    assert [len(batch) for batch in batches] == [3]
+    assert buffer._task is None
@@ -0,0 +1,39 @@
+import pytest
+from app.services.knowledge.semantic_cache import SemanticCache
+
+@pytest.fixture
+def cache():
+    return SemanticCache(max_entries=3, ttl_seconds=60, threshold=0.95)
+
+def test_exact_hit_is_scoped(cache):
+    cache.put("what is rag", [1.0, 0.0, 0.0], scope=(1, None), value=[10, 11])
+
+    assert cache.get("what is rag", (1, None)) == [10, 11]
+    assert cache.get("what is rag", (2, None)) is None
+
+def test_similar_query_hits_above_threshold(cache):
+    cache.put("what is rag", [1.0, 0.0, 0.0], scope=(1, None), value=[10, 11])
+
+    assert cache.get_similar([0.99, 0.05, 0.0], (1, None)) == [10, 11]
+    assert cache.get_similar([0.0, 1.0, 0.0], (1, None)) is None
+
+def test_least_recently_used_entry_is_evicted(cache):
+    cache.put("a", [1.0, 0.0, 0.0], scope=1, value=["a"])
+    cache.put("b", [0.0, 1.0, 0.0], scope=1, value=["b"])
+    cache.put("c", [0.0, 0.0, 1.0], scope=1, value=["c"])
+    cache.get("a", 1)
+    cache.put("d", [1.0, 1.0, 0.0], scope=1, value=["d"])
+
+    assert cache.get("a", 1) == ["a"]
+    assert cache.get("b", 1) is None
+
+def test_invalidate_repository_drops_matching_and_unscoped_entries(cache):
+    cache.put("a", [1.0, 0.0, 0.0], scope=1, value=["a"], repository_id=5)
+    cache.put("b", [0.0, 1.0, 0.0], scope=1, value=["b"], repository_id=None)
+    cache.put("c", [0.0, 0.0, 1.0], scope=1, value=["c"], repository_id=6)
+
+    cache.invalidate_repository(5)
+
+    assert cache.get("a", 1) is None
+    assert cache.get("b", 1) is None
+    assert cache.get("c", 1) == ["c"]
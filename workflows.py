@@ -13,7 +13,7 @@ router = APIRouter()
 def create_workflow(
     workflow: schemas.WorkflowCreate, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Create a new workflow
@@ -38,7 +38,7 @@ def read_workflows(
     skip: int = 0, 
     limit: int = 100, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve workflows
@@ -71,7 +71,7 @@ def read_workflows(
 def read_workflow(
     workflow_id: int, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve a specific workflow
@@ -92,7 +92,7 @@ def update_workflow(
     workflow_id: int, 
     workflow_update: schemas.WorkflowCreate, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Update a workflow
@@ -121,7 +121,7 @@ def update_workflow(
 def delete_workflow(
     workflow_id: int, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Delete a workflow
@@ -144,7 +144,7 @@ def delete_workflow(
 def create_workflow_session(
     workflow_session: schemas.WorkflowSessionCreate, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Create a new workflow session
@@ -184,7 +184,7 @@ def create_workflow_session(
 def read_workflow_sessions_by_session(
     session_id: int, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Retrieve workflow sessions for a specific session
@@ -209,7 +209,7 @@ def update_workflow_session(
     workflow_session_id: int, 
     workflow_session_update: schemas.WorkflowSessionCreate, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user)
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user)
 ):
     """
     Update a workflow session
@@ -241,7 +241,7 @@ def update_workflow_session(
 async def execute_workflow_step(
     workflow_session_id: int, 
     db: Session = Depends(get_db), 
-    current_user: schemas.User = Depends(auth.get_current_user),
+    current_user: schemas.CurrentUser = Depends(auth.get_current_user),
     gemini_service: GeminiService = Depends(lambda: GeminiService())
 ):
     """